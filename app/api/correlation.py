@@ -0,0 +1,105 @@
+"""多品种收益率相关系数/协方差矩阵接口"""
+import asyncio
+import time
+import numpy as np
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.config import settings
+from app.models import CorrelationRequest, CorrelationResponse, MatrixTypeEnum
+from app.services.mt5_service import mt5_service
+from app.services.streaming import iter_rates_batch
+from app.services.alignment import align_rates
+from app.services.correlation import MatrixCache, compute_returns, covariance_series, correlation_from_covariance
+from app.exceptions import InsufficientDataError, IndicatorCalculationError, ServiceOverloadedError, RateLimitExceededError
+from app.auth import get_api_key
+from app.metrics import observe_stage
+from app.rate_limit import charge_request, estimate_cost
+from app.utils import format_mt5_epochs_to_beijing, mt5_epochs_to_timestamps, TIMEFRAME_SECONDS
+from app.api.helpers import round_values
+
+# 相关系数/协方差矩阵结果缓存
+correlation_cache = MatrixCache(settings.correlation_cache_size)
+
+router = APIRouter()
+
+@router.post("/market-data/correlation", response_model=CorrelationResponse, dependencies=[Depends(get_api_key)])
+async def get_correlation_matrix(request: CorrelationRequest, http_request: Request):
+    """多品种收益率相关系数/协方差矩阵：按公共时间轴对齐已收盘K线，结果按最后一根已收盘K线缓存"""
+    if not 2 <= len(request.symbols) <= settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"品种数量需在2到{settings.batch_max_items}个之间"
+        )
+    if request.window is not None and request.span is not None:
+        raise HTTPException(status_code=400, detail="window与span不能同时指定")
+    
+    try:
+        # 转换日期格式
+        start_time = datetime.fromisoformat(f"{request.start_date}T00:00:00")
+        end_time = datetime.fromisoformat(f"{request.end_date}T23:59:59")
+        charge_request(http_request, len(request.symbols) * estimate_cost(
+            request.timeframe.value, start_time, end_time
+        ))
+        
+        # 经获取队列批量获取原始K线（优先命中K线缓存）
+        items = [
+            (symbol, request.timeframe.value, start_time, end_time)
+            for symbol in request.symbols
+        ]
+        rates_by_index = {}
+        errors = {}
+        async for index, rates, error, cached in iter_rates_batch(mt5_service, items):
+            if error is not None:
+                errors[request.symbols[index]] = error
+            else:
+                rates_by_index[index] = rates
+        
+        indices = sorted(rates_by_index)
+        symbols = [request.symbols[i] for i in indices]
+        if len(symbols) < 2:
+            raise InsufficientDataError("成功获取行情数据的品种不足2个")
+        times, fields = align_rates([rates_by_index[i] for i in indices], request.fill_method.value)
+        
+        # 只使用已收盘的K线，结果在下一根K线收盘前保持不变
+        period = TIMEFRAME_SECONDS.get(request.timeframe.value, 60)
+        closed = mt5_epochs_to_timestamps(times) + period <= time.time()
+        times, close = times[closed], fields['close'][closed]
+        if len(times) == 0:
+            raise InsufficientDataError("没有已收盘的行情数据")
+        
+        key = (request.model_dump_json(), tuple(symbols), int(times[-1]), len(times))
+        result = correlation_cache.get(key)
+        if result is None:
+            returns = compute_returns(close, request.returns.value)
+            valid = ~np.isnan(returns).any(axis=1)
+            returns, return_times = returns[valid], times[1:][valid]
+            required = request.points + (request.window - 1 if request.window is not None else 1)
+            if len(returns) < required:
+                raise InsufficientDataError(f"数据不足，需要至少{required}个完整收益率，当前只有{len(returns)}个")
+            
+            with observe_stage("indicator", timeframe=request.timeframe.value, indicator="correlation"):
+                loop = asyncio.get_running_loop()
+                matrices = await loop.run_in_executor(
+                    None, covariance_series, returns, request.points, request.window, request.span
+                )
+                if request.matrix == MatrixTypeEnum.CORRELATION:
+                    matrices = correlation_from_covariance(matrices)
+            result = (return_times[-request.points:], matrices, len(returns))
+            correlation_cache.put(key, result)
+        
+        matrix_times, matrices, observations = result
+        matrices = round_values(matrices, request.precision)
+        return CorrelationResponse(
+            timeframe=request.timeframe.value,
+            symbols=symbols,
+            dates=format_mt5_epochs_to_beijing(matrix_times),
+            timestamps=mt5_epochs_to_timestamps(matrix_times).tolist(),
+            matrices=np.where(np.isnan(matrices), None, matrices).tolist(),
+            observations=observations,
+            errors=errors
+        )
+        
+    except (InsufficientDataError, ServiceOverloadedError, RateLimitExceededError) as e:
+        raise e
+    except Exception as e:
+        raise IndicatorCalculationError(f"相关系数矩阵计算失败: {str(e)}")
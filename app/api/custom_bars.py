@@ -0,0 +1,86 @@
+"""非时间K线接口（Tick/成交量/区间/Renko/Heikin-Ashi K线）"""
+import asyncio
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.models import CustomBarsRequest, CustomBarsResponse, BarTypeEnum, BarSourceEnum, ResponseFormatEnum
+from app.services.mt5_service import mt5_service
+from app.services.streaming import fetch_custom_bars
+from app.services.technical_indicators import technical_indicators_service
+from app.exceptions import (
+    DataRetrievalError,
+    InvalidSymbolError,
+    InvalidTimeframeError,
+    UnsupportedIndicatorError,
+    ServiceOverloadedError
+)
+from app.auth import get_api_key
+from app.metrics import observe_stage
+from app.rate_limit import charge_request, estimate_cost, estimate_tick_cost
+from app.api.helpers import requested_fields, output_digits, round_values, get_indicator_period
+
+router = APIRouter()
+
+@router.post("/market-data/custom-bars", response_model=CustomBarsResponse, response_model_exclude_none=True, dependencies=[Depends(get_api_key)])
+async def get_custom_bars(request: CustomBarsRequest, http_request: Request):
+    """非时间K线接口：由逐笔报价或M1 K线在服务端构建Tick/成交量/区间/Renko/Heikin-Ashi K线"""
+    for indicator in request.indicators:
+        if get_indicator_period(indicator) == 0:
+            raise UnsupportedIndicatorError(f"不支持的指标: {indicator}")
+    if request.bar_type == BarTypeEnum.HEIKIN_ASHI:
+        cost = estimate_cost(request.timeframe.value, request.start_time, request.end_time, len(request.indicators))
+    elif request.source == BarSourceEnum.TICKS:
+        cost = estimate_tick_cost(request.start_time, request.end_time)
+    else:
+        cost = estimate_cost("M1", request.start_time, request.end_time, len(request.indicators))
+    charge_request(http_request, cost)
+    
+    try:
+        bars = await fetch_custom_bars(
+            mt5_service,
+            symbol=request.symbol,
+            bar_type=request.bar_type.value,
+            size=request.size,
+            start_time=request.start_time,
+            end_time=request.end_time,
+            source=request.source.value,
+            price=request.price.value,
+            timeframe=request.timeframe.value,
+            smooth=request.heikin_ashi
+        )
+        
+        # 生成的K线与MT5原始K线同结构，直接复用向量化指标内核
+        indicators_data = {}
+        digits = output_digits(request.symbol, request.precision)
+        if len(bars) > 0:
+            fields = {field: bars[field].astype(float) for field in ("high", "low", "close", "tick_volume")}
+            for indicator in request.indicators:
+                await asyncio.sleep(0)
+                with observe_stage("indicator", timeframe=request.bar_type.value, indicator=indicator):
+                    values = technical_indicators_service.calculate_indicator_matrix(indicator, fields, request.smoothing.value)
+                values = round_values(values, digits)
+                indicators_data[indicator] = np.where(np.isnan(values), None, values).tolist()
+        
+        fields = requested_fields(request)
+        if request.format == ResponseFormatEnum.COLUMNS:
+            data, columns = [], mt5_service.rates_to_columns(bars, fields)
+        else:
+            data, columns = mt5_service.rates_to_records(bars, fields), None
+        
+        return CustomBarsResponse(
+            symbol=request.symbol,
+            bar_type=request.bar_type.value,
+            data=data,
+            columns=columns,
+            indicators=indicators_data,
+            count=len(bars),
+            start_time=request.start_time,
+            end_time=request.end_time
+        )
+        
+    except (InvalidSymbolError, InvalidTimeframeError, DataRetrievalError, ServiceOverloadedError) as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"构建非时间K线失败: {str(e)}"
+        )
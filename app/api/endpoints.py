@@ -1,23 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, AsyncIterator
+from app.config import settings
 from app.utils import get_beijing_now
 
 from app.models import (
     MarketDataRequest, 
     MarketDataResponse, 
+    BatchMarketDataRequest,
+    BatchMarketDataItem,
+    BatchMarketDataResponse,
+    ResampleMarketDataRequest,
+    ResampleMarketDataResponse,
     HealthResponse,
+    SymbolInfoResponse,
     TimeframeEnum,
+    ResponseFormatEnum,
     TechnicalIndicatorRequest,
     TechnicalIndicatorResponse,
-    TechnicalIndicatorValue,
-    BatchTechnicalIndicatorRequest,
-    BatchTechnicalIndicatorResponse,
     SupportedIndicator,
     SupportedIndicatorsResponse
 )
 from app.services.mt5_service import mt5_service
+from app.services.streaming import iter_rates_batch
 from app.services.technical_indicators import technical_indicators_service
+from app.services.indicator_registry import indicator_registry
+from app.services.downsampling import downsample_rates
 from app.exceptions import (
     MT5ConnectionError, 
     DataRetrievalError, 
@@ -25,9 +35,16 @@ from app.exceptions import (
     InvalidTimeframeError,
     InsufficientDataError,
     UnsupportedIndicatorError,
-    IndicatorCalculationError
+    IndicatorCalculationError,
+    ServiceOverloadedError,
+    RateLimitExceededError
 )
 from app.auth import get_api_key
+from app.http_cache import compute_etag, cache_headers, is_not_modified, not_modified_response
+from app.compression import cached_response, encoded_response
+from app.metrics import observe_stage
+from app.rate_limit import charge_request, estimate_cost
+from app.api.helpers import requested_fields, output_digits, indicator_values, get_indicator_period
 
 router = APIRouter()
 
@@ -52,28 +69,158 @@ async def health_check():
             timestamp=beijing_time
         )
 
-@router.post("/market-data", response_model=MarketDataResponse, dependencies=[Depends(get_api_key)])
-async def get_market_data(request: MarketDataRequest):
+@router.post("/market-data", response_model=MarketDataResponse, response_model_exclude_none=True, dependencies=[Depends(get_api_key)])
+async def get_market_data(request: MarketDataRequest, http_request: Request):
     """获取行情数据接口"""
+    charge_request(http_request, estimate_cost(request.timeframe.value, request.start_time, request.end_time))
+    
     try:
-        # 获取行情数据
-        data = mt5_service.get_market_data(
+        # 获取K线缓存条目
+        entry = await mt5_service.fetch_entry(
             symbol=request.symbol,
             timeframe=request.timeframe.value,
             start_time=request.start_time,
             end_time=request.end_time
         )
         
-        return MarketDataResponse(
+        # 条件请求：内容未变化时直接返回304
+        etag = compute_etag(request, [entry])
+        headers = cache_headers(etag, [entry])
+        if is_not_modified(http_request, etag):
+            return not_modified_response(headers)
+        
+        # 命中响应体缓存时跳过序列化与压缩
+        cached = cached_response(http_request, etag, headers)
+        if cached is not None:
+            return cached
+        
+        fields = requested_fields(request)
+        rates = downsample_rates(entry.rates, request.max_points, request.downsample_method.value)
+        
+        # 列式结构：每个字段只返回一个数组
+        if request.format == ResponseFormatEnum.COLUMNS:
+            columns = mt5_service.rates_to_columns(rates, fields)
+            with observe_stage("validate", timeframe=request.timeframe.value):
+                result = MarketDataResponse(
+                    symbol=request.symbol,
+                    timeframe=request.timeframe.value,
+                    data=[],
+                    columns=columns,
+                    count=len(rates),
+                    start_time=request.start_time,
+                    end_time=request.end_time
+                )
+            return encoded_response(http_request, result, etag, headers, exclude_none=True)
+        
+        data = mt5_service.rates_to_records(rates, fields)
+        
+        with observe_stage("validate", timeframe=request.timeframe.value):
+            result = MarketDataResponse(
+                symbol=request.symbol,
+                timeframe=request.timeframe.value,
+                data=data,
+                count=len(data),
+                start_time=request.start_time,
+                end_time=request.end_time
+            )
+        return encoded_response(http_request, result, etag, headers, exclude_none=True)
+        
+    except (InvalidSymbolError, InvalidTimeframeError, DataRetrievalError, ServiceOverloadedError) as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取行情数据失败: {str(e)}"
+        )
+
+async def _iter_batch_market_data(request: BatchMarketDataRequest) -> AsyncIterator[BatchMarketDataItem]:
+    """按完成顺序产出批量行情数据结果"""
+    items = [
+        (item.symbol, item.timeframe.value, item.start_time, item.end_time)
+        for item in request.items
+    ]
+    async for index, rates, error, cached in iter_rates_batch(mt5_service, items):
+        item = request.items[index]
+        rates = downsample_rates(rates, item.max_points, item.downsample_method.value)
+        fields = requested_fields(item)
+        if item.format == ResponseFormatEnum.COLUMNS:
+            data, columns = [], mt5_service.rates_to_columns(rates, fields)
+        else:
+            data, columns = mt5_service.rates_to_records(rates, fields), None
+        yield BatchMarketDataItem(
+            index=index,
+            symbol=item.symbol,
+            timeframe=item.timeframe.value,
+            data=data,
+            columns=columns,
+            count=len(rates),
+            start_time=item.start_time,
+            end_time=item.end_time,
+            cached=cached,
+            error=error
+        )
+
+@router.post("/market-data/batch", response_model=BatchMarketDataResponse, dependencies=[Depends(get_api_key)])
+async def get_batch_market_data(request: BatchMarketDataRequest, http_request: Request):
+    """批量获取行情数据接口"""
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"批量请求数量超出限制，最多{settings.batch_max_items}项"
+        )
+    charge_request(http_request, sum(
+        estimate_cost(item.timeframe.value, item.start_time, item.end_time)
+        for item in request.items
+    ))
+    
+    if request.stream:
+        async def stream():
+            async for item in _iter_batch_market_data(request):
+                yield item.model_dump_json() + "\n"
+        
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+    
+    try:
+        results = [None] * len(request.items)
+        async for item in _iter_batch_market_data(request):
+            results[item.index] = item
+        
+        return BatchMarketDataResponse(results=results, count=len(results))
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"批量获取行情数据失败: {str(e)}"
+        )
+
+@router.post("/market-data/resample", response_model=ResampleMarketDataResponse, dependencies=[Depends(get_api_key)])
+async def get_resampled_market_data(request: ResampleMarketDataRequest, http_request: Request):
+    """多周期合成行情数据接口：由一段低周期K线在服务端合成多个高周期"""
+    if not request.timeframes:
+        raise InvalidTimeframeError("时间周期列表不能为空")
+    charge_request(http_request, estimate_cost(
+        request.base_timeframe.value, request.start_time, request.end_time, len(request.timeframes)
+    ))
+    
+    try:
+        data = await mt5_service.fetch_resampled_market_data(
+            symbol=request.symbol,
+            base_timeframe=request.base_timeframe.value,
+            timeframes=request.timeframes,
+            start_time=request.start_time,
+            end_time=request.end_time
+        )
+        
+        return ResampleMarketDataResponse(
             symbol=request.symbol,
-            timeframe=request.timeframe.value,
+            base_timeframe=request.base_timeframe.value,
             data=data,
-            count=len(data),
+            count={timeframe: len(bars) for timeframe, bars in data.items()},
             start_time=request.start_time,
             end_time=request.end_time
         )
         
-    except (InvalidSymbolError, InvalidTimeframeError, DataRetrievalError) as e:
+    except (InvalidSymbolError, InvalidTimeframeError, DataRetrievalError, ServiceOverloadedError) as e:
         raise e
     except Exception as e:
         raise HTTPException(
@@ -81,21 +228,20 @@ async def get_market_data(request: MarketDataRequest):
             detail=f"获取行情数据失败: {str(e)}"
         )
 
+async def _ensure_symbol_catalog():
+    """交易品种目录尚未加载时同步加载一次"""
+    if not mt5_service.symbols.loaded:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, mt5_service.symbols.refresh)
+
 @router.get("/symbols", dependencies=[Depends(get_api_key)])
-async def get_symbols():
-    """获取可用交易品种列表"""
+async def get_symbols(http_request: Request, group: Optional[str] = None):
+    """获取可用交易品种列表，group按MT5分组语法过滤，如 *USD*、EUR*,!*JPY"""
+    charge_request(http_request, 1)
+    
     try:
-        if not mt5_service.is_connected():
-            raise MT5ConnectionError()
-        
-        import MetaTrader5 as mt5
-        symbols = mt5.symbols_get()
-        
-        if symbols is None:
-            return {"symbols": []}
-        
-        symbol_list = [symbol.name for symbol in symbols]
-        return {"symbols": symbol_list}
+        await _ensure_symbol_catalog()
+        return {"symbols": mt5_service.symbols.search(group)}
         
     except MT5ConnectionError as e:
         raise e
@@ -105,6 +251,26 @@ async def get_symbols():
             detail=f"获取交易品种列表失败: {str(e)}"
         )
 
+@router.get("/symbols/{symbol}", response_model=SymbolInfoResponse, dependencies=[Depends(get_api_key)])
+async def get_symbol_info(symbol: str, http_request: Request):
+    """获取交易品种元数据（小数位数、最小价格变动等）"""
+    charge_request(http_request, 1)
+    
+    try:
+        await _ensure_symbol_catalog()
+    except MT5ConnectionError as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取交易品种列表失败: {str(e)}"
+        )
+    
+    info = mt5_service.symbols.get(symbol)
+    if info is None:
+        raise InvalidSymbolError(f"无效的交易品种: {symbol}")
+    return SymbolInfoResponse(**info.to_dict())
+
 @router.get("/timeframes", dependencies=[Depends(get_api_key)])
 async def get_timeframes():
     """获取支持的时间周期列表"""
@@ -113,63 +279,74 @@ async def get_timeframes():
 
 # 技术指标相关接口
 @router.post("/technical-indicators", response_model=TechnicalIndicatorResponse, dependencies=[Depends(get_api_key)])
-async def get_technical_indicator(request: TechnicalIndicatorRequest):
+async def get_technical_indicator(request: TechnicalIndicatorRequest, http_request: Request):
     """获取单个技术指标数据"""
     try:
         # 转换日期格式
         start_time = datetime.fromisoformat(f"{request.start_date}T00:00:00")
         end_time = datetime.fromisoformat(f"{request.end_date}T23:59:59")
+        charge_request(http_request, estimate_cost(request.timeframe.value, start_time, end_time, 1))
         
-        # 获取行情数据
-        market_data = mt5_service.get_market_data(
+        # 获取K线缓存条目
+        entry = await mt5_service.fetch_entry(
             symbol=request.symbol,
             timeframe=request.timeframe.value,
             start_time=start_time,
             end_time=end_time
         )
         
-        if not market_data:
+        # 条件请求：K线、参数与输出小数位数均未变化时直接返回304，跳过指标计算
+        digits = output_digits(request.symbol, request.precision)
+        etag = compute_etag(request, [entry], f"digits={digits}")
+        headers = cache_headers(etag, [entry])
+        if is_not_modified(http_request, etag):
+            return not_modified_response(headers)
+        
+        # 命中响应体缓存时跳过序列化与压缩
+        cached = cached_response(http_request, etag, headers)
+        if cached is not None:
+            return cached
+        
+        rates = entry.rates
+        
+        if len(rates) == 0:
             raise InsufficientDataError("没有获取到行情数据")
         
         # 验证数据量是否足够计算指标
-        required_period = _get_indicator_period(request.indicator)
-        if len(market_data) < required_period:
-            raise InsufficientDataError(f"数据不足，需要至少{required_period}个数据点，当前只有{len(market_data)}个")
+        required_period = get_indicator_period(request.indicator)
+        if len(rates) < required_period:
+            raise InsufficientDataError(f"数据不足，需要至少{required_period}个数据点，当前只有{len(rates)}个")
         
         # 计算技术指标
-        indicator_values = technical_indicators_service.calculate_indicator(
-            request.indicator, 
-            market_data
-        )
+        with observe_stage("indicator", timeframe=request.timeframe.value, indicator=request.indicator):
+            values = technical_indicators_service.calculate_indicator(request.indicator, rates, request.smoothing.value)
         
-        # 过滤掉None值
-        filtered_values = [
-            TechnicalIndicatorValue(
-                date=item["date"],
-                value=item["value"],
-                timestamp=item["timestamp"]
+        # 过滤掉空值，降采样后再统一转换时间
+        with observe_stage("validate", timeframe=request.timeframe.value, indicator=request.indicator):
+            filtered_values, total_points = indicator_values(
+                rates['time'], values, request.max_points, request.downsample_method.value, digits
             )
-            for item in indicator_values
-            if item["value"] is not None
-        ]
         
         # 构建元数据
         metadata = {
-            "calculation_period": _get_indicator_period(request.indicator),
-            "total_points": len(filtered_values),
+            "calculation_period": get_indicator_period(request.indicator),
+            "total_points": total_points,
+            "returned_points": len(filtered_values),
             "start_date": request.start_date,
             "end_date": request.end_date
         }
         
-        return TechnicalIndicatorResponse(
-            symbol=request.symbol,
-            indicator=request.indicator,
-            timeframe=request.timeframe.value,
-            values=filtered_values,
-            metadata=metadata
-        )
+        with observe_stage("validate", timeframe=request.timeframe.value, indicator=request.indicator):
+            result = TechnicalIndicatorResponse(
+                symbol=request.symbol,
+                indicator=request.indicator,
+                timeframe=request.timeframe.value,
+                values=filtered_values,
+                metadata=metadata
+            )
+        return encoded_response(http_request, result, etag, headers)
         
-    except (InsufficientDataError, UnsupportedIndicatorError, IndicatorCalculationError) as e:
+    except (InsufficientDataError, UnsupportedIndicatorError, IndicatorCalculationError, ServiceOverloadedError, RateLimitExceededError) as e:
         raise e
     except ValueError as e:
         raise UnsupportedIndicatorError(str(e))
@@ -179,163 +356,12 @@ async def get_technical_indicator(request: TechnicalIndicatorRequest):
         logging.error(f"技术指标计算失败 - 品种: {request.symbol}, 指标: {request.indicator}, 错误: {str(e)}")
         raise IndicatorCalculationError(f"计算技术指标失败: {str(e)}")
 
-@router.post("/technical-indicators/batch", response_model=BatchTechnicalIndicatorResponse, dependencies=[Depends(get_api_key)])
-async def get_batch_technical_indicators(request: BatchTechnicalIndicatorRequest):
-    """批量获取技术指标数据"""
-    try:
-        # 转换日期格式
-        start_time = datetime.fromisoformat(f"{request.start_date}T00:00:00")
-        end_time = datetime.fromisoformat(f"{request.end_date}T23:59:59")
-        
-        # 获取行情数据
-        market_data = mt5_service.get_market_data(
-            symbol=request.symbol,
-            timeframe=request.timeframe.value,
-            start_time=start_time,
-            end_time=end_time
-        )
-        
-        if not market_data:
-            raise InsufficientDataError("没有获取到行情数据")
-        
-        # 计算所有指标
-        indicators_data = {}
-        for indicator in request.indicators:
-            try:
-                indicator_values = technical_indicators_service.calculate_indicator(
-                    indicator, 
-                    market_data
-                )
-                
-                # 过滤掉None值
-                filtered_values = [
-                    TechnicalIndicatorValue(
-                        date=item["date"],
-                        value=item["value"],
-                        timestamp=item["timestamp"]
-                    )
-                    for item in indicator_values
-                    if item["value"] is not None
-                ]
-                
-                indicators_data[indicator] = filtered_values
-                
-            except Exception as e:
-                # 如果某个指标计算失败，记录错误但继续处理其他指标
-                indicators_data[indicator] = []
-        
-        return BatchTechnicalIndicatorResponse(
-            symbol=request.symbol,
-            timeframe=request.timeframe.value,
-            indicators=indicators_data
-        )
-        
-    except InsufficientDataError as e:
-        raise e
-    except Exception as e:
-        raise IndicatorCalculationError(f"批量计算技术指标失败: {str(e)}")
+# 支持的指标列表由指标注册表在启动时生成一次
+SUPPORTED_INDICATORS = SupportedIndicatorsResponse(
+    indicators=[SupportedIndicator(**item) for item in indicator_registry.describe()]
+)
 
 @router.get("/technical-indicators/supported", response_model=SupportedIndicatorsResponse, dependencies=[Depends(get_api_key)])
 async def get_supported_indicators():
     """获取支持的指标列表"""
-    supported_indicators = [
-        SupportedIndicator(
-            name="close_50_sma",
-            description="50日简单移动平均线",
-            category="moving_averages",
-            parameters={"period": 50, "type": "sma"}
-        ),
-        SupportedIndicator(
-            name="close_200_sma",
-            description="200日简单移动平均线",
-            category="moving_averages",
-            parameters={"period": 200, "type": "sma"}
-        ),
-        SupportedIndicator(
-            name="close_10_ema",
-            description="10日指数移动平均线",
-            category="moving_averages",
-            parameters={"period": 10, "type": "ema"}
-        ),
-        SupportedIndicator(
-            name="macd",
-            description="MACD主线",
-            category="macd_indicators",
-            parameters={"fast_period": 12, "slow_period": 26, "signal_period": 9}
-        ),
-        SupportedIndicator(
-            name="macds",
-            description="MACD信号线",
-            category="macd_indicators",
-            parameters={"fast_period": 12, "slow_period": 26, "signal_period": 9}
-        ),
-        SupportedIndicator(
-            name="macdh",
-            description="MACD柱状图",
-            category="macd_indicators",
-            parameters={"fast_period": 12, "slow_period": 26, "signal_period": 9}
-        ),
-        SupportedIndicator(
-            name="rsi",
-            description="相对强弱指数",
-            category="momentum_indicators",
-            parameters={"period": 14}
-        ),
-        SupportedIndicator(
-            name="boll",
-            description="布林带中轨",
-            category="volatility_indicators",
-            parameters={"period": 20, "std_dev": 2}
-        ),
-        SupportedIndicator(
-            name="boll_ub",
-            description="布林带上轨",
-            category="volatility_indicators",
-            parameters={"period": 20, "std_dev": 2}
-        ),
-        SupportedIndicator(
-            name="boll_lb",
-            description="布林带下轨",
-            category="volatility_indicators",
-            parameters={"period": 20, "std_dev": 2}
-        ),
-        SupportedIndicator(
-            name="atr",
-            description="平均真实波幅",
-            category="volatility_indicators",
-            parameters={"period": 14}
-        ),
-        SupportedIndicator(
-            name="vwma",
-            description="成交量加权移动平均线",
-            category="volume_indicators",
-            parameters={"period": 20}
-        ),
-        SupportedIndicator(
-            name="mfi",
-            description="资金流量指数",
-            category="volume_indicators",
-            parameters={"period": 14}
-        )
-    ]
-    
-    return SupportedIndicatorsResponse(indicators=supported_indicators)
-
-def _get_indicator_period(indicator_name: str) -> int:
-    """获取指标的周期参数"""
-    period_map = {
-        "close_50_sma": 50,
-        "close_200_sma": 200,
-        "close_10_ema": 10,
-        "macd": 26,
-        "macds": 26,
-        "macdh": 26,
-        "rsi": 14,
-        "boll": 20,
-        "boll_ub": 20,
-        "boll_lb": 20,
-        "atr": 14,
-        "vwma": 20,
-        "mfi": 14
-    }
-    return period_map.get(indicator_name, 0)
+    return SUPPORTED_INDICATORS
@@ -0,0 +1,55 @@
+"""接口层公共函数：字段投影、指标值舍入与降采样"""
+import numpy as np
+from typing import List, Optional, Tuple
+from app.models import TechnicalIndicatorValue
+from app.services.mt5_service import mt5_service
+from app.services.indicator_registry import indicator_registry
+from app.services.downsampling import downsample_series
+from app.utils import format_mt5_epochs_to_beijing, mt5_epochs_to_timestamps
+
+def requested_fields(request) -> Optional[List[str]]:
+    """获取请求的行情字段列表（去重并保持顺序），未指定时返回None表示全部字段"""
+    if not request.fields:
+        return None
+    return list(dict.fromkeys(field.value for field in request.fields))
+
+def output_digits(symbol: str, precision: Optional[int]) -> Optional[int]:
+    """指标值输出的小数位数：请求指定时优先，否则使用交易品种的digits；品种目录未加载时不舍入"""
+    if precision is not None:
+        return precision
+    info = mt5_service.symbols.get(symbol)
+    return info.digits if info is not None else None
+
+def round_values(values: np.ndarray, digits: Optional[int]) -> np.ndarray:
+    """在序列化前对指标值做一次向量化舍入，计算过程保持完整精度"""
+    return values if digits is None else np.round(values, digits)
+
+def indicator_values(
+    times: np.ndarray, 
+    values: np.ndarray, 
+    max_points: Optional[int], 
+    method: str,
+    digits: Optional[int] = None
+) -> Tuple[List[TechnicalIndicatorValue], int]:
+    """过滤空值、降采样并舍入，返回 (指标值列表, 降采样前的数据点数)
+    
+    时间以MT5时间戳贯穿计算过程，只在这里对保留的数据点做一次向量化格式化。
+    """
+    valid = ~np.isnan(values)
+    times, values = times[valid], values[valid]
+    total_points = len(values)
+    if max_points and total_points > max_points:
+        indices = downsample_series(times.astype(float), values, max_points, method)
+        times, values = times[indices], values[indices]
+    values = round_values(values, digits)
+    
+    dates = format_mt5_epochs_to_beijing(times)
+    timestamps = mt5_epochs_to_timestamps(times).tolist()
+    return [
+        TechnicalIndicatorValue(date=date, value=value, timestamp=timestamp)
+        for date, value, timestamp in zip(dates, values.tolist(), timestamps)
+    ], total_points
+
+def get_indicator_period(indicator_name: str) -> int:
+    """获取指标的预热长度（计算首个有效值所需的K线数量），不支持的指标返回0"""
+    return indicator_registry.warmup(indicator_name)
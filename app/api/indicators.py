@@ -0,0 +1,277 @@
+"""技术指标扩展接口：多输出指标族、批量指标与多品种指标"""
+import asyncio
+import logging
+import numpy as np
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.config import settings
+from app.models import (
+    IndicatorGroupRequest,
+    IndicatorGroupResponse,
+    BatchTechnicalIndicatorRequest,
+    BatchTechnicalIndicatorResponse,
+    MultiSymbolIndicatorRequest,
+    MultiSymbolIndicatorResponse
+)
+from app.services.mt5_service import mt5_service
+from app.services.streaming import iter_rates_batch
+from app.services.technical_indicators import technical_indicators_service
+from app.services.indicator_registry import indicator_registry
+from app.services.alignment import align_rates
+from app.services.downsampling import downsample_series
+from app.exceptions import (
+    InsufficientDataError,
+    UnsupportedIndicatorError,
+    IndicatorCalculationError,
+    ServiceOverloadedError,
+    RateLimitExceededError
+)
+from app.auth import get_api_key
+from app.http_cache import compute_etag, cache_headers, is_not_modified, not_modified_response
+from app.compression import cached_response, encoded_response
+from app.metrics import observe_stage
+from app.rate_limit import charge_request, estimate_cost
+from app.utils import format_mt5_epochs_to_beijing, mt5_epochs_to_timestamps
+from app.api.helpers import output_digits, round_values, indicator_values, get_indicator_period
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.post("/technical-indicators/group", response_model=IndicatorGroupResponse, dependencies=[Depends(get_api_key)])
+async def get_indicator_group(request: IndicatorGroupRequest, http_request: Request):
+    """多输出指标接口：一次计算指标族的全部输出（如MACD主线、信号线与柱状图），共用一条时间轴返回"""
+    spec = indicator_registry.get_family(request.indicator)
+    if spec is None:
+        raise UnsupportedIndicatorError(f"不支持的指标: {request.indicator}")
+    outputs = request.outputs or list(spec.outputs)
+    for output in outputs:
+        if output not in spec.outputs:
+            raise UnsupportedIndicatorError(f"指标{spec.name}没有输出: {output}")
+    
+    try:
+        # 转换日期格式
+        start_time = datetime.fromisoformat(f"{request.start_date}T00:00:00")
+        end_time = datetime.fromisoformat(f"{request.end_date}T23:59:59")
+        charge_request(http_request, estimate_cost(request.timeframe.value, start_time, end_time, 1))
+        
+        # 获取K线缓存条目
+        entry = await mt5_service.fetch_entry(
+            symbol=request.symbol,
+            timeframe=request.timeframe.value,
+            start_time=start_time,
+            end_time=end_time
+        )
+        
+        # 条件请求：K线、参数与输出小数位数均未变化时直接返回304，跳过指标计算
+        digits = output_digits(request.symbol, request.precision)
+        etag = compute_etag(request, [entry], f"digits={digits}")
+        headers = cache_headers(etag, [entry])
+        if is_not_modified(http_request, etag):
+            return not_modified_response(headers)
+        
+        # 命中响应体缓存时跳过序列化与压缩
+        cached = cached_response(http_request, etag, headers)
+        if cached is not None:
+            return cached
+        
+        rates = entry.rates
+        
+        if len(rates) == 0:
+            raise InsufficientDataError("没有获取到行情数据")
+        
+        # 验证数据量是否足够计算所有输出
+        required_period = max(spec.warmup[output] for output in outputs)
+        if len(rates) < required_period:
+            raise InsufficientDataError(f"数据不足，需要至少{required_period}个数据点，当前只有{len(rates)}个")
+        
+        with observe_stage("indicator", timeframe=request.timeframe.value, indicator=spec.name):
+            values = technical_indicators_service.calculate_indicator_group(spec.name, rates, request.smoothing.value)
+        
+        # 时间轴取任一输出有值的K线；降采样按预热最短的输出选点，其余输出共用同一组时间点
+        with observe_stage("validate", timeframe=request.timeframe.value, indicator=spec.name):
+            columns = np.column_stack([values[output] for output in outputs])
+            missing = np.isnan(columns)
+            valid = ~missing.all(axis=1)
+            times, columns = rates['time'][valid], columns[valid]
+            total_points = len(times)
+            if request.max_points and total_points > request.max_points:
+                guide = columns[:, int(np.argmin(missing.sum(axis=0)))]
+                guide = np.where(np.isnan(guide), np.nanmean(guide), guide)
+                indices = downsample_series(times.astype(float), guide, request.max_points, request.downsample_method.value)
+                times, columns = times[indices], columns[indices]
+            columns = round_values(columns, digits)
+            
+            result = IndicatorGroupResponse(
+                symbol=request.symbol,
+                indicator=spec.name,
+                timeframe=request.timeframe.value,
+                dates=format_mt5_epochs_to_beijing(times),
+                timestamps=mt5_epochs_to_timestamps(times).tolist(),
+                values={
+                    output: np.where(np.isnan(column), None, column).tolist()
+                    for output, column in zip(outputs, columns.T)
+                },
+                metadata={
+                    "calculation_period": required_period,
+                    "parameters": {**spec.parameters, **spec.extra},
+                    "total_points": total_points,
+                    "returned_points": len(times),
+                    "start_date": request.start_date,
+                    "end_date": request.end_date
+                }
+            )
+        return encoded_response(http_request, result, etag, headers)
+        
+    except (InsufficientDataError, UnsupportedIndicatorError, IndicatorCalculationError, ServiceOverloadedError, RateLimitExceededError) as e:
+        raise e
+    except ValueError as e:
+        raise UnsupportedIndicatorError(str(e))
+    except Exception as e:
+        logger.error(f"多输出指标计算失败 - 品种: {request.symbol}, 指标: {request.indicator}, 错误: {str(e)}")
+        raise IndicatorCalculationError(f"计算技术指标失败: {str(e)}")
+
+@router.post("/technical-indicators/batch", response_model=BatchTechnicalIndicatorResponse, dependencies=[Depends(get_api_key)])
+async def get_batch_technical_indicators(request: BatchTechnicalIndicatorRequest, http_request: Request):
+    """批量获取技术指标数据"""
+    try:
+        # 转换日期格式
+        start_time = datetime.fromisoformat(f"{request.start_date}T00:00:00")
+        end_time = datetime.fromisoformat(f"{request.end_date}T23:59:59")
+        charge_request(http_request, estimate_cost(
+            request.timeframe.value, start_time, end_time, len(request.indicators)
+        ))
+        
+        # 获取K线缓存条目
+        entry = await mt5_service.fetch_entry(
+            symbol=request.symbol,
+            timeframe=request.timeframe.value,
+            start_time=start_time,
+            end_time=end_time
+        )
+        
+        # 条件请求：K线、参数与输出小数位数均未变化时直接返回304
+        digits = output_digits(request.symbol, request.precision)
+        etag = compute_etag(request, [entry], f"digits={digits}")
+        headers = cache_headers(etag, [entry])
+        if is_not_modified(http_request, etag):
+            return not_modified_response(headers)
+        
+        # 命中响应体缓存时跳过序列化与压缩
+        cached = cached_response(http_request, etag, headers)
+        if cached is not None:
+            return cached
+        
+        rates = entry.rates
+        
+        if len(rates) == 0:
+            raise InsufficientDataError("没有获取到行情数据")
+        
+        # 计算所有指标
+        indicators_data = {}
+        # 同一指标族的多个输出（如macd/macds/macdh）只计算一次
+        groups = {}
+        for indicator in request.indicators:
+            # 每个指标之间让出事件循环，客户端已断开时请求在此处被取消
+            await asyncio.sleep(0)
+            try:
+                spec = indicator_registry.get(indicator)
+                if spec is None:
+                    raise ValueError(f"不支持的指标: {indicator}")
+                if spec.name not in groups:
+                    with observe_stage("indicator", timeframe=request.timeframe.value, indicator=spec.name):
+                        groups[spec.name] = technical_indicators_service.calculate_indicator_group(
+                            spec.name, rates, request.smoothing.value
+                        )
+                values = groups[spec.name][indicator]
+                
+                # 过滤掉空值，降采样后再统一转换时间
+                with observe_stage("validate", timeframe=request.timeframe.value, indicator=indicator):
+                    indicators_data[indicator], _ = indicator_values(
+                        rates['time'], values, request.max_points, request.downsample_method.value, digits
+                    )
+                
+            except Exception as e:
+                # 如果某个指标计算失败，记录错误但继续处理其他指标
+                indicators_data[indicator] = []
+        
+        with observe_stage("validate", timeframe=request.timeframe.value):
+            result = BatchTechnicalIndicatorResponse(
+                symbol=request.symbol,
+                timeframe=request.timeframe.value,
+                indicators=indicators_data
+            )
+        return encoded_response(http_request, result, etag, headers)
+        
+    except (InsufficientDataError, ServiceOverloadedError, RateLimitExceededError) as e:
+        raise e
+    except Exception as e:
+        raise IndicatorCalculationError(f"批量计算技术指标失败: {str(e)}")
+
+@router.post("/technical-indicators/multi-symbol", response_model=MultiSymbolIndicatorResponse, dependencies=[Depends(get_api_key)])
+async def get_multi_symbol_indicators(request: MultiSymbolIndicatorRequest, http_request: Request):
+    """多品种技术指标接口：按公共时间轴对齐后一次性向量化计算"""
+    if len(request.symbols) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"品种数量超出限制，最多{settings.batch_max_items}个"
+        )
+    
+    for indicator in request.indicators:
+        if get_indicator_period(indicator) == 0:
+            raise UnsupportedIndicatorError(f"不支持的指标: {indicator}")
+    
+    try:
+        # 转换日期格式
+        start_time = datetime.fromisoformat(f"{request.start_date}T00:00:00")
+        end_time = datetime.fromisoformat(f"{request.end_date}T23:59:59")
+        charge_request(http_request, len(request.symbols) * estimate_cost(
+            request.timeframe.value, start_time, end_time, len(request.indicators)
+        ))
+        
+        # 经获取队列批量获取原始K线
+        items = [
+            (symbol, request.timeframe.value, start_time, end_time)
+            for symbol in request.symbols
+        ]
+        rates_by_index = {}
+        errors = {}
+        async for index, rates, error, cached in iter_rates_batch(mt5_service, items):
+            if error is not None:
+                errors[request.symbols[index]] = error
+            else:
+                rates_by_index[index] = rates
+        
+        indices = sorted(rates_by_index)
+        symbols = [request.symbols[i] for i in indices]
+        times, fields = align_rates([rates_by_index[i] for i in indices], request.fill_method.value)
+        
+        if len(times) == 0:
+            raise InsufficientDataError("没有获取到行情数据")
+        
+        # 在 (T, S) 二维数组上计算指标，输出时按各品种的小数位数逐列舍入
+        digits = [output_digits(symbol, request.precision) for symbol in symbols]
+        indicators_data = {}
+        for indicator in request.indicators:
+            # 每个指标之间让出事件循环，客户端已断开时请求在此处被取消
+            await asyncio.sleep(0)
+            with observe_stage("indicator", timeframe=request.timeframe.value, indicator=indicator):
+                values = technical_indicators_service.calculate_indicator_matrix(indicator, fields, request.smoothing.value)
+            indicators_data[indicator] = {
+                symbol: np.where(np.isnan(column), None, round_values(column, digits[col])).tolist()
+                for col, (symbol, column) in enumerate(zip(symbols, values.T))
+            }
+        
+        return MultiSymbolIndicatorResponse(
+            timeframe=request.timeframe.value,
+            symbols=symbols,
+            dates=format_mt5_epochs_to_beijing(times),
+            timestamps=mt5_epochs_to_timestamps(times).tolist(),
+            indicators=indicators_data,
+            errors=errors
+        )
+        
+    except (InsufficientDataError, UnsupportedIndicatorError, ServiceOverloadedError, RateLimitExceededError) as e:
+        raise e
+    except Exception as e:
+        raise IndicatorCalculationError(f"多品种技术指标计算失败: {str(e)}")
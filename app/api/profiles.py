@@ -0,0 +1,14 @@
+"""性能剖析结果查询接口"""
+from fastapi import APIRouter, Depends, HTTPException
+from app.auth import get_api_key
+from app.profiling import profile_store
+
+router = APIRouter()
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(get_api_key)])
+async def get_profile(profile_id: str):
+    """获取性能剖析结果（请求时携带 profile=1，由 X-Profile-Id 响应头返回ID）"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"剖析结果不存在或已过期: {profile_id}")
+    return profile
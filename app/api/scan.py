@@ -0,0 +1,87 @@
+"""条件扫描接口"""
+import asyncio
+import numpy as np
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.config import settings
+from app.models import ScanModeEnum, ScanRequest, ScanMatch, ScanResponse
+from app.services.mt5_service import mt5_service
+from app.services.streaming import iter_rates_batch
+from app.services.scanner import Condition
+from app.exceptions import IndicatorCalculationError, InvalidConditionError, ServiceOverloadedError, RateLimitExceededError
+from app.auth import get_api_key
+from app.metrics import observe_stage
+from app.rate_limit import charge_request, estimate_cost
+from app.utils import format_mt5_epochs_to_beijing, mt5_epochs_to_timestamps
+
+router = APIRouter()
+
+@router.post("/technical-indicators/scan", response_model=ScanResponse, dependencies=[Depends(get_api_key)])
+async def scan_symbols(request: ScanRequest, http_request: Request):
+    """条件扫描接口：在缓存K线上对多个品种并行求值条件表达式，只返回满足条件的品种与时间点"""
+    if len(request.symbols) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"品种数量超出限制，最多{settings.batch_max_items}个"
+        )
+    
+    condition = Condition(request.condition)
+    
+    try:
+        # 转换日期格式
+        start_time = datetime.fromisoformat(f"{request.start_date}T00:00:00")
+        end_time = datetime.fromisoformat(f"{request.end_date}T23:59:59")
+        charge_request(http_request, len(request.symbols) * estimate_cost(
+            request.timeframe.value, start_time, end_time, condition.indicator_count
+        ))
+        
+        def evaluate(rates: np.ndarray) -> np.ndarray:
+            """求值并返回满足条件的K线时间（MT5时间戳）"""
+            if len(rates) == 0:
+                return np.empty(0, dtype=np.int64)
+            if request.mode == ScanModeEnum.LAST:
+                # 只关心最后一根K线，但指标仍需完整的历史窗口
+                matched = condition.evaluate(rates, request.smoothing.value)[-1:]
+                return rates['time'][-1:][matched]
+            return rates['time'][condition.evaluate(rates, request.smoothing.value)]
+        
+        # 品种K线到达后立即在线程池中求值，与其余品种的获取并行
+        loop = asyncio.get_running_loop()
+        items = [
+            (symbol, request.timeframe.value, start_time, end_time)
+            for symbol in request.symbols
+        ]
+        evaluations = {}
+        errors = {}
+        async for index, rates, error, cached in iter_rates_batch(mt5_service, items):
+            if error is not None:
+                errors[request.symbols[index]] = error
+            else:
+                evaluations[index] = loop.run_in_executor(None, evaluate, rates)
+        
+        with observe_stage("indicator", timeframe=request.timeframe.value, indicator="scan"):
+            indices = sorted(evaluations)
+            results = await asyncio.gather(*(evaluations[index] for index in indices))
+        
+        matches = [
+            ScanMatch(
+                symbol=request.symbols[index],
+                dates=format_mt5_epochs_to_beijing(times),
+                timestamps=mt5_epochs_to_timestamps(times).tolist()
+            )
+            for index, times in zip(indices, results)
+            if len(times) > 0
+        ]
+        
+        return ScanResponse(
+            timeframe=request.timeframe.value,
+            condition=request.condition,
+            scanned=len(indices),
+            matches=matches,
+            errors=errors
+        )
+        
+    except (InvalidConditionError, ServiceOverloadedError, RateLimitExceededError) as e:
+        raise e
+    except Exception as e:
+        raise IndicatorCalculationError(f"条件扫描失败: {str(e)}")
@@ -0,0 +1,76 @@
+"""逐笔报价流式接口"""
+import json
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.models import TickDataRequest, TickFormatEnum
+from app.services.mt5_service import mt5_service
+from app.services.streaming import iter_ticks, ticks_to_columns, ticks_to_npy
+from app.exceptions import MT5ConnectionError, DataRetrievalError, InvalidSymbolError, ServiceOverloadedError
+from app.auth import get_api_key
+from app.rate_limit import charge_request, estimate_tick_cost
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+@router.post("/ticks", dependencies=[Depends(get_api_key)])
+async def get_ticks(request: TickDataRequest, http_request: Request):
+    """逐笔报价接口：按时间片从终端获取并流式返回
+    
+    ndjson格式每个时间片输出一行 {"count": n, "columns": {...}}；
+    npy格式依次输出每个时间片的.npy数组，可循环调用numpy.load读取。
+    """
+    if request.end_time < request.start_time:
+        raise HTTPException(status_code=400, detail="结束时间不能早于开始时间")
+    charge_request(http_request, estimate_tick_cost(request.start_time, request.end_time))
+    
+    fields = list(dict.fromkeys(field.value for field in request.fields)) if request.fields else None
+    slices = iter_ticks(mt5_service, request.symbol, request.start_time, request.end_time, request.flags.value)
+    
+    # 先获取第一个非空时间片，品种无效、过载等错误仍可按状态码返回
+    try:
+        first = await slices.__anext__()
+    except StopAsyncIteration:
+        first = None
+    except (InvalidSymbolError, MT5ConnectionError, DataRetrievalError, ServiceOverloadedError) as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取逐笔报价失败: {str(e)}"
+        )
+    
+    if request.format == TickFormatEnum.NPY:
+        async def stream_npy():
+            try:
+                if first is None:
+                    return
+                yield ticks_to_npy(first, fields)
+                async for ticks in slices:
+                    yield ticks_to_npy(ticks, fields)
+            finally:
+                await slices.aclose()
+        
+        return StreamingResponse(stream_npy(), media_type="application/octet-stream")
+    
+    def encode(ticks) -> str:
+        return json.dumps({"count": len(ticks), "columns": ticks_to_columns(ticks, fields)}) + "\n"
+    
+    async def stream_ndjson():
+        try:
+            if first is None:
+                return
+            yield encode(first)
+            async for ticks in slices:
+                yield encode(ticks)
+        except HTTPException as e:
+            # 响应头已发出，中途出错时以错误行结束
+            yield json.dumps({"error": e.detail}) + "\n"
+        except Exception as e:
+            logger.exception("流式返回逐笔报价失败")
+            yield json.dumps({"error": f"获取逐笔报价失败: {str(e)}"}) + "\n"
+        finally:
+            await slices.aclose()
+    
+    return StreamingResponse(stream_ndjson(), media_type="application/x-ndjson")
@@ -1,15 +1,20 @@
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from app.config import settings
 
 security = HTTPBearer()
 
-async def get_api_key(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """验证API密钥"""
-    if credentials.credentials != settings.api_key:
+def is_valid_api_key(api_key: str) -> bool:
+    """判断API密钥是否有效"""
+    return bool(api_key) and api_key in settings.api_key_limits
+
+async def get_api_key(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """验证API密钥，并记录到请求状态中供限流使用"""
+    if not is_valid_api_key(credentials.credentials):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的API密钥，请在请求头中添加有效的Bearer Token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    request.state.api_key = credentials.credentials
     return credentials.credentials
@@ -0,0 +1,138 @@
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from fastapi import Request, Response
+from pydantic import BaseModel
+from app.config import settings
+from app.metrics import observe_stage, CACHE_REQUESTS
+
+try:
+    import zstandard
+except ImportError:
+    # 未安装zstandard时只协商gzip
+    zstandard = None
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    """解析Accept-Encoding请求头，返回 {编码: q值}"""
+    encodings = {}
+    for part in header.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, params = part.partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        encodings[name.strip().lower()] = q
+    return encodings
+
+def choose_encoding(request: Request) -> Optional[str]:
+    """根据Accept-Encoding选择响应编码，优先zstd，其次gzip"""
+    encodings = _parse_accept_encoding(request.headers.get("accept-encoding", ""))
+    wildcard = encodings.get("*", 0.0)
+    candidates = ["zstd", "gzip"] if zstandard is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for name in candidates:
+        q = encodings.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+def compress(body: bytes, encoding: Optional[str]) -> bytes:
+    """按指定编码压缩响应体"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=settings.zstd_level).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=settings.gzip_level)
+    return body
+
+class CompressedResponseCache:
+    """已序列化（及压缩）响应体的LRU缓存
+
+    以 (ETag, 编码) 为键。ETag由请求参数与K线内容摘要生成，
+    内容变化时ETag随之变化，因此缓存条目无需单独失效。
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, Optional[str]], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, encoding: Optional[str]) -> Optional[bytes]:
+        """获取缓存的响应体"""
+        with self._lock:
+            body = self._entries.get((etag, encoding))
+            if body is not None:
+                self._entries.move_to_end((etag, encoding))
+            return body
+
+    def put(self, etag: str, encoding: Optional[str], body: bytes):
+        """写入响应体，超出容量时淘汰最久未使用的条目"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop((etag, encoding), None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[(etag, encoding)] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+# 全局响应体缓存实例
+response_cache = CompressedResponseCache(settings.response_cache_max_bytes)
+
+def _build_response(body: bytes, encoding: Optional[str], headers: Dict[str, str]) -> Response:
+    """构建JSON响应并设置编码相关响应头"""
+    headers = dict(headers)
+    headers["Vary"] = "Accept-Encoding"
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def cached_response(request: Request, etag: str, headers: Dict[str, str]) -> Optional[Response]:
+    """命中响应体缓存时直接返回，跳过序列化与压缩"""
+    encoding = choose_encoding(request)
+    body = response_cache.get(etag, encoding)
+    if body is None and encoding is not None:
+        # 低于压缩阈值的响应以未压缩形式缓存，对任意编码请求都可直接返回
+        body = response_cache.get(etag, None)
+        if body is None or len(body) >= settings.compression_min_size:
+            CACHE_REQUESTS.inc(cache="response", result="miss")
+            return None
+        encoding = None
+    if body is None:
+        CACHE_REQUESTS.inc(cache="response", result="miss")
+        return None
+    CACHE_REQUESTS.inc(cache="response", result="hit")
+    return _build_response(body, encoding, headers)
+
+def encoded_response(
+    request: Request,
+    model: BaseModel,
+    etag: str,
+    headers: Dict[str, str],
+    exclude_none: bool = False
+) -> Response:
+    """序列化并按协商结果压缩响应，同时写入响应体缓存
+
+    小于COMPRESSION_MIN_SIZE的响应不压缩。
+    """
+    with observe_stage("serialize"):
+        body = model.model_dump_json(exclude_none=exclude_none).encode()
+    encoding = choose_encoding(request)
+    if len(body) < settings.compression_min_size:
+        encoding = None
+    else:
+        with observe_stage("compress"):
+            body = compress(body, encoding)
+
+    response_cache.put(etag, encoding, body)
+    return _build_response(body, encoding, headers)
@@ -21,11 +21,86 @@ class Settings:
         # API配置
         self.api_key = get_env_value("API_KEY", "test_api_key_123")
         
+        # 限流配置（令牌桶：每秒补充令牌数与桶容量；store为memory或sqlite）
+        self.rate_limit_enabled = get_env_value("RATE_LIMIT_ENABLED", "false").lower() == "true"
+        self.rate_limit_rate = float(get_env_value("RATE_LIMIT_RATE", "10"))
+        self.rate_limit_burst = float(get_env_value("RATE_LIMIT_BURST", "200"))
+        self.rate_limit_bars_per_token = float(get_env_value("RATE_LIMIT_BARS_PER_TOKEN", "1000"))
+        self.rate_limit_store = get_env_value("RATE_LIMIT_STORE", "memory")
+        self.rate_limit_store_path = get_env_value("RATE_LIMIT_STORE_PATH", "rate_limit.db")
+        # 多个API密钥，逗号分隔，可按 密钥:每秒令牌数:桶容量 单独设置额度
+        self.api_key_limits = self._parse_api_keys(get_env_value("API_KEYS", ""))
+        
         # MT5配置
         self.mt5_login = int(get_env_value("MT5_LOGIN", "0"))
         self.mt5_password = get_env_value("MT5_PASSWORD", "")
         self.mt5_server = get_env_value("MT5_SERVER", "")
         self.mt5_timeout = int(get_env_value("MT5_TIMEOUT", "60000"))
+        
+        # 终端进程池配置（逗号分隔的多个终端安装路径，为空时由本进程连接默认终端）
+        self.mt5_terminal_paths = [
+            path.strip() for path in get_env_value("MT5_TERMINAL_PATHS", "").split(",") if path.strip()
+        ]
+        self.mt5_pool_call_timeout = float(get_env_value("MT5_POOL_CALL_TIMEOUT", "30"))
+        self.mt5_pool_health_interval = float(get_env_value("MT5_POOL_HEALTH_INTERVAL", "10"))
+        
+        # 多worker部署配置（MT5_MODE为local时由本进程访问终端；shared时由属主进程访问终端，
+        # worker经共享K线存储读取数据）
+        self.mt5_mode = get_env_value("MT5_MODE", "local")
+        self.bar_store_dir = get_env_value("BAR_STORE_DIR", "bar_store")
+        self.bar_store_max_bytes = int(get_env_value("BAR_STORE_MAX_BYTES", "1073741824"))
+        self.bar_owner_host = get_env_value("BAR_OWNER_HOST", "127.0.0.1")
+        self.bar_owner_port = int(get_env_value("BAR_OWNER_PORT", "3021"))
+        self.bar_owner_authkey = get_env_value("BAR_OWNER_AUTHKEY", self.api_key)
+        
+        # 交易品种目录配置（刷新间隔，单位秒）
+        self.symbol_catalog_ttl = float(get_env_value("SYMBOL_CATALOG_TTL", "300"))
+        
+        # K线缓存配置
+        self.bar_cache_max_entries = int(get_env_value("BAR_CACHE_MAX_ENTRIES", "1024"))
+        self.bar_cache_ttl = float(get_env_value("BAR_CACHE_TTL", "5"))
+        
+        # HTTP缓存配置（已收盘历史区间的Cache-Control max-age，单位秒；响应需API密钥，默认只允许客户端私有缓存）
+        self.http_cache_max_age = int(get_env_value("HTTP_CACHE_MAX_AGE", "31536000"))
+        self.http_cache_public = get_env_value("HTTP_CACHE_PUBLIC", "false").lower() == "true"
+        
+        # 响应压缩配置
+        self.gzip_level = int(get_env_value("GZIP_LEVEL", "6"))
+        self.zstd_level = int(get_env_value("ZSTD_LEVEL", "3"))
+        self.compression_min_size = int(get_env_value("COMPRESSION_MIN_SIZE", "1024"))
+        self.response_cache_max_bytes = int(get_env_value("RESPONSE_CACHE_MAX_BYTES", "67108864"))
+        
+        # 性能剖析配置（授权调用方可通过 profile=1 开启）
+        self.profiling_enabled = get_env_value("PROFILING_ENABLED", "true").lower() == "true"
+        self.profile_store_size = int(get_env_value("PROFILE_STORE_SIZE", "50"))
+        self.profile_top_n = int(get_env_value("PROFILE_TOP_N", "30"))
+        
+        # 逐笔报价配置（每个时间片的时长，单位秒）
+        self.tick_slice_seconds = int(get_env_value("TICK_SLICE_SECONDS", "3600"))
+        
+        # 批量接口配置
+        self.batch_max_items = int(get_env_value("BATCH_MAX_ITEMS", "200"))
+        
+        # 相关系数/协方差矩阵结果缓存条目数
+        self.correlation_cache_size = int(get_env_value("CORRELATION_CACHE_SIZE", "256"))
+        
+        # 准入控制配置（MT5获取队列最大深度；请求默认/最大截止时间，单位秒）
+        self.fetch_queue_max_depth = int(get_env_value("FETCH_QUEUE_MAX_DEPTH", "100"))
+        self.request_timeout = float(get_env_value("REQUEST_TIMEOUT", "10"))
+        self.request_max_timeout = float(get_env_value("REQUEST_MAX_TIMEOUT", "60"))
+    
+    def _parse_api_keys(self, value: str) -> dict:
+        """解析API_KEYS，返回 {API密钥: (每秒令牌数, 桶容量)}，API_KEY始终有效"""
+        limits = {self.api_key: (self.rate_limit_rate, self.rate_limit_burst)}
+        for item in value.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            parts = item.split(":")
+            rate = float(parts[1]) if len(parts) > 1 else self.rate_limit_rate
+            burst = float(parts[2]) if len(parts) > 2 else self.rate_limit_burst
+            limits[parts[0]] = (rate, burst)
+        return limits
 
 # 全局配置实例
 settings = Settings()
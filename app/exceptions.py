@@ -64,3 +64,29 @@ class IndicatorCalculationError(HTTPException):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=detail
         )
+
+class InvalidConditionError(HTTPException):
+    """无效扫描条件异常"""
+    def __init__(self, detail: str = "无效的条件表达式"):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
+
+class ServiceOverloadedError(HTTPException):
+    """服务过载异常（准入控制拒绝）"""
+    def __init__(self, detail: str = "服务繁忙，请稍后重试", retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class RateLimitExceededError(HTTPException):
+    """请求频率超限异常"""
+    def __init__(self, detail: str = "请求额度已用尽，请稍后重试", retry_after: int = 1, headers: dict = None):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={**(headers or {}), "Retry-After": str(retry_after)}
+        )
@@ -0,0 +1,56 @@
+import hashlib
+from email.utils import formatdate
+from typing import Dict, List, Optional
+from fastapi import Request, Response
+from pydantic import BaseModel
+from app.config import settings
+from app.services.bar_cache import BarCacheEntry
+
+def compute_etag(request_model: BaseModel, entries: List[BarCacheEntry], variant: Optional[str] = None) -> str:
+    """由请求参数、K线内容摘要与影响输出的服务端状态（如实际使用的小数位数）生成弱ETag"""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(request_model.model_dump_json().encode())
+    if variant is not None:
+        hasher.update(variant.encode())
+    for entry in entries:
+        hasher.update(entry.digest.encode())
+    return f'W/"{hasher.hexdigest()}"'
+
+def cache_headers(etag: str, entries: List[BarCacheEntry]) -> Dict[str, str]:
+    """生成ETag、Last-Modified与Cache-Control响应头
+
+    所有K线均已收盘的历史区间内容不可变，允许长期缓存；响应需API密钥，默认为private，
+    只有配置HTTP_CACHE_PUBLIC时才允许共享代理/CDN缓存。否则要求客户端每次携带ETag重新验证。
+    """
+    modified_at = max((entry.modified_at for entry in entries), default=None)
+    headers = {"ETag": etag}
+    if modified_at is not None:
+        headers["Last-Modified"] = formatdate(modified_at, usegmt=True)
+
+    if entries and all(entry.closed for entry in entries):
+        scope = "public" if settings.http_cache_public else "private"
+        headers["Cache-Control"] = f"{scope}, max-age={settings.http_cache_max_age}, immutable"
+    else:
+        headers["Cache-Control"] = "no-cache"
+    return headers
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """判断If-None-Match是否与当前ETag匹配（弱比较）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+
+    current = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == current:
+            return True
+    return False
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """构建304响应"""
+    return Response(status_code=304, headers=headers)
@@ -1,10 +1,26 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 
 from app.api.endpoints import router
-from app.middleware import api_key_middleware, exception_handler
+from app.api.custom_bars import router as custom_bars_router
+from app.api.correlation import router as correlation_router
+from app.api.ticks import router as ticks_router
+from app.api.indicators import router as indicators_router
+from app.api.scan import router as scan_router
+from app.api.profiles import router as profiles_router
+from app.middleware import (
+    DisconnectCancellationMiddleware,
+    api_key_middleware,
+    metrics_middleware,
+    server_timing_middleware,
+    deadline_middleware,
+    rate_limit_headers_middleware,
+    exception_handler
+)
+from app.metrics import registry
+from app.auth import get_api_key
 from app.exceptions import (
     MT5ConnectionError, 
     InvalidAPIKeyError, 
@@ -13,7 +29,10 @@ from app.exceptions import (
     DataRetrievalError,
     InsufficientDataError,
     UnsupportedIndicatorError,
-    IndicatorCalculationError
+    IndicatorCalculationError,
+    InvalidConditionError,
+    ServiceOverloadedError,
+    RateLimitExceededError
 )
 
 # 创建FastAPI应用
@@ -34,11 +53,30 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "Server-Timing", "X-Profile-Id", "ETag", "Retry-After",
+        "X-RateLimit-Limit", "X-RateLimit-Remaining", "X-RateLimit-Reset", "X-RateLimit-Cost"
+    ],
 )
 
 # 注释掉旧的中间件，使用新的Bearer Token认证
 # app.middleware("http")(api_key_middleware)
 
+# 限流用量响应头中间件
+app.middleware("http")(rate_limit_headers_middleware)
+
+# 请求截止时间中间件（准入控制）
+app.middleware("http")(deadline_middleware)
+
+# Server-Timing与性能剖析中间件
+app.middleware("http")(server_timing_middleware)
+
+# 请求指标中间件
+app.middleware("http")(metrics_middleware)
+
+# 客户端断开时取消请求处理（最外层）
+app.add_middleware(DisconnectCancellationMiddleware)
+
 # 注册异常处理器
 app.add_exception_handler(MT5ConnectionError, exception_handler)
 app.add_exception_handler(InvalidAPIKeyError, exception_handler)
@@ -48,9 +86,18 @@ app.add_exception_handler(DataRetrievalError, exception_handler)
 app.add_exception_handler(InsufficientDataError, exception_handler)
 app.add_exception_handler(UnsupportedIndicatorError, exception_handler)
 app.add_exception_handler(IndicatorCalculationError, exception_handler)
+app.add_exception_handler(InvalidConditionError, exception_handler)
+app.add_exception_handler(ServiceOverloadedError, exception_handler)
+app.add_exception_handler(RateLimitExceededError, exception_handler)
 
 # 注册路由
 app.include_router(router, prefix="/api/v1", tags=["MT5 Data"])
+app.include_router(custom_bars_router, prefix="/api/v1", tags=["MT5 Data"])
+app.include_router(correlation_router, prefix="/api/v1", tags=["MT5 Data"])
+app.include_router(ticks_router, prefix="/api/v1", tags=["MT5 Data"])
+app.include_router(indicators_router, prefix="/api/v1", tags=["MT5 Data"])
+app.include_router(scan_router, prefix="/api/v1", tags=["MT5 Data"])
+app.include_router(profiles_router, prefix="/api/v1", tags=["MT5 Data"])
 
 @app.get("/")
 async def root():
@@ -61,6 +108,11 @@ async def root():
         "docs": "/docs"
     }
 
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(get_api_key)])
+async def metrics():
+    """Prometheus指标（文本格式），与其他接口一样需要API密钥"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
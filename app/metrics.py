@@ -0,0 +1,173 @@
+"""Prometheus指标
+
+轻量实现Counter与Histogram，以Prometheus文本格式 (0.0.4) 输出。
+请求所属的接口（路由模板）与时间周期通过上下文变量传递，分阶段耗时会自动带上对应标签。
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# 当前请求的ASGI scope，由中间件设置；路由匹配后其中带有所匹配的路由
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+# 当前请求的时间周期，由K线获取时设置
+current_timeframe: ContextVar[str] = ContextVar("current_timeframe", default="")
+# 当前请求各阶段累计耗时（秒），由Server-Timing中间件设置
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+# 默认耗时分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """格式化标签集合"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    """计数器"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        """计数增加"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> List[str]:
+        """输出文本格式"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram:
+    """直方图"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        """记录一次观测值"""
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            # 各分桶计数（非累计）、总和、总数
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self) -> List[str]:
+        """输出文本格式"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """注册指标"""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """以Prometheus文本格式输出全部指标"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP请求总耗时", ("endpoint", "method", "status")
+))
+STAGE_DURATION = registry.register(Histogram(
+    "mt5_api_stage_duration_seconds",
+    "请求各阶段耗时（mt5_fetch/convert/indicator/validate/serialize/compress）",
+    ("stage", "endpoint", "timeframe", "indicator")
+))
+CACHE_REQUESTS = registry.register(Counter(
+    "mt5_api_cache_requests_total", "缓存查询次数", ("cache", "result")
+))
+MT5_ERRORS = registry.register(Counter(
+    "mt5_errors_total", "MT5终端调用错误次数", ("operation",)
+))
+MT5_RECONNECTS = registry.register(Counter(
+    "mt5_reconnects_total", "MT5重新连接次数"
+))
+MT5_WORKER_RESTARTS = registry.register(Counter(
+    "mt5_terminal_worker_restarts_total", "MT5终端工作进程重启次数", ("worker",)
+))
+CLIENT_DISCONNECTS = registry.register(Counter(
+    "http_client_disconnects_total", "客户端断开后被取消的请求数", ("endpoint",)
+))
+FETCH_REJECTIONS = registry.register(Counter(
+    "mt5_fetch_rejections_total", "MT5获取队列拒绝的请求数（queue_full/deadline/expired）", ("reason",)
+))
+
+def endpoint_label(scope: Optional[dict]) -> str:
+    """接口标签取所匹配路由的路径模板（如 /symbols/{symbol}），未匹配任何路由时为unmatched
+
+    不使用原始请求路径，避免路径参数与404路径产生无限多的时间序列。
+    """
+    route = scope.get("route") if scope is not None else None
+    return getattr(route, "path", None) or "unmatched"
+
+@contextmanager
+def observe_stage(stage: str, timeframe: str = "", indicator: str = ""):
+    """记录一个处理阶段的耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+        STAGE_DURATION.observe(
+            elapsed,
+            stage=stage,
+            endpoint=endpoint_label(current_scope.get()),
+            timeframe=timeframe or current_timeframe.get(),
+            indicator=indicator
+        )
@@ -1,7 +1,23 @@
+import asyncio
+import time
 from fastapi import Request, HTTPException, status
 from fastapi.responses import JSONResponse
 from app.config import settings
 from app.exceptions import InvalidAPIKeyError
+from app.metrics import current_scope, endpoint_label, request_timings, REQUEST_DURATION, CLIENT_DISCONNECTS
+from app.auth import is_valid_api_key
+from app.profiling import start_profile, stop_profile, top_functions, profile_store
+from app.services.fetch_queue import request_deadline
+
+# Server-Timing中各阶段所属类别
+STAGE_CATEGORIES = {
+    "mt5_fetch": "fetch",
+    "convert": "compute",
+    "indicator": "compute",
+    "validate": "serialize",
+    "serialize": "serialize",
+    "compress": "serialize"
+}
 
 async def api_key_middleware(request: Request, call_next):
     """API密钥验证中间件"""
@@ -22,6 +38,148 @@ async def api_key_middleware(request: Request, call_next):
     response = await call_next(request)
     return response
 
+async def metrics_middleware(request: Request, call_next):
+    """请求指标中间件：记录请求总耗时，并为分阶段耗时提供endpoint标签"""
+    token = current_scope.set(request.scope)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint=endpoint_label(request.scope),
+            method=request.method,
+            status=status_code
+        )
+        current_scope.reset(token)
+
+async def deadline_middleware(request: Request, call_next):
+    """请求截止时间中间件
+
+    调用方可通过 X-Request-Timeout 请求头（秒）指定截止时间，
+    不超过REQUEST_MAX_TIMEOUT；未指定时使用REQUEST_TIMEOUT。
+    """
+    timeout = settings.request_timeout
+    header = request.headers.get("x-request-timeout")
+    if header:
+        try:
+            timeout = float(header)
+        except ValueError:
+            pass
+    timeout = min(max(timeout, 0.0), settings.request_max_timeout)
+    token = request_deadline.set(time.monotonic() + timeout)
+    try:
+        return await call_next(request)
+    finally:
+        request_deadline.reset(token)
+
+class DisconnectCancellationMiddleware:
+    """客户端断开时取消请求处理
+
+    uvicorn在客户端断开后不会中止请求处理，排队中的终端调用与指标计算仍会执行完毕。
+    本中间件在后台监听 http.disconnect，响应完成前客户端断开时取消请求处理任务。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        messages = asyncio.Queue()
+        response_complete = False
+        disconnected = False
+        
+        async def send_wrapper(message):
+            nonlocal response_complete
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                response_complete = True
+        
+        async def listen():
+            nonlocal disconnected
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not response_complete:
+                        disconnected = True
+                        app_task.cancel()
+                    return
+        
+        app_task = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+        listener = asyncio.ensure_future(listen())
+        try:
+            await app_task
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+            CLIENT_DISCONNECTS.inc(endpoint=endpoint_label(scope))
+        finally:
+            listener.cancel()
+            app_task.cancel()
+
+async def rate_limit_headers_middleware(request: Request, call_next):
+    """将本次请求的限流用量写入响应头"""
+    response = await call_next(request)
+    headers = getattr(request.state, "rate_limit_headers", None)
+    if headers:
+        response.headers.update(headers)
+    return response
+
+def _format_server_timing(timings: dict, total: float) -> str:
+    """生成Server-Timing响应头（毫秒）"""
+    parts = [
+        f'{stage};desc="{STAGE_CATEGORIES.get(stage, stage)}";dur={duration * 1000:.2f}'
+        for stage, duration in timings.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+def _bearer_token(request: Request) -> str:
+    """从请求头中提取Bearer Token"""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" else ""
+
+async def server_timing_middleware(request: Request, call_next):
+    """Server-Timing中间件：在响应头中给出各阶段耗时
+
+    授权调用方可在查询参数中携带 profile=1，以cProfile剖析本次请求，
+    耗时最多的函数保存在内存中，通过 X-Profile-Id 响应头返回其ID。
+    剖析器只作用于事件循环线程：并发请求的调用会混入结果，MT5获取与线程池中的工作不计入。
+    """
+    timings = {}
+    token = request_timings.set(timings)
+    profiler = None
+    if (
+        settings.profiling_enabled
+        and request.query_params.get("profile") == "1"
+        and is_valid_api_key(_bearer_token(request))
+    ):
+        profiler = start_profile()
+    
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        total = time.perf_counter() - start
+        request_timings.reset(token)
+        if profiler is not None:
+            stop_profile(profiler)
+    
+    response.headers["Server-Timing"] = _format_server_timing(timings, total)
+    if profiler is not None:
+        profile_id = profile_store.add(
+            request.url.path, total * 1000, top_functions(profiler, settings.profile_top_n)
+        )
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
 async def exception_handler(request: Request, exc: Exception):
     """全局异常处理器"""
     if isinstance(exc, HTTPException):
@@ -30,7 +188,8 @@ async def exception_handler(request: Request, exc: Exception):
             content={
                 "error": exc.detail,
                 "status_code": exc.status_code
-            }
+            },
+            headers=getattr(exc, "headers", None)
         )
     
     # 处理其他异常
@@ -15,18 +15,167 @@ class TimeframeEnum(str, Enum):
     W1 = "W1"
     MN1 = "MN1"
 
+class DownsampleMethodEnum(str, Enum):
+    """图表降采样方式枚举"""
+    LTTB = "lttb"
+    MINMAX = "minmax"
+
+class SmoothingEnum(str, Enum):
+    """RSI/ATR/MFI平滑方式枚举"""
+    SMA = "sma"
+    WILDER = "wilder"
+
+class MarketDataFieldEnum(str, Enum):
+    """行情数据字段枚举"""
+    TIME = "time"
+    OPEN = "open"
+    HIGH = "high"
+    LOW = "low"
+    CLOSE = "close"
+    TICK_VOLUME = "tick_volume"
+    SPREAD = "spread"
+    REAL_VOLUME = "real_volume"
+
+class ResponseFormatEnum(str, Enum):
+    """行情数据响应结构枚举"""
+    RECORDS = "records"
+    COLUMNS = "columns"
+
 class MarketDataRequest(BaseModel):
     """行情数据请求模型"""
     symbol: str = Field(..., description="交易品种", example="EURUSD")
     timeframe: TimeframeEnum = Field(..., description="时间周期", example="H1")
     start_time: datetime = Field(..., description="开始时间", example="2024-01-01T00:00:00")
     end_time: datetime = Field(..., description="结束时间", example="2024-01-02T00:00:00")
+    max_points: Optional[int] = Field(None, ge=3, description="最多返回的数据点数，超出时在服务端降采样", example=2000)
+    downsample_method: DownsampleMethodEnum = Field(DownsampleMethodEnum.LTTB, description="降采样方式：lttb或minmax")
+    fields: Optional[List[MarketDataFieldEnum]] = Field(None, description="需要返回的字段，默认返回全部字段", example=["time", "close"])
+    format: ResponseFormatEnum = Field(ResponseFormatEnum.RECORDS, description="响应结构：records按行返回data，columns按列返回columns")
 
 class MarketDataResponse(BaseModel):
     """行情数据响应模型"""
     symbol: str
     timeframe: str
     data: List[dict]
+    columns: Optional[Dict[str, list]] = Field(None, description="列式数据，仅format为columns时返回")
+    count: int
+    start_time: datetime
+    end_time: datetime
+
+class BatchMarketDataRequest(BaseModel):
+    """批量行情数据请求模型"""
+    items: List[MarketDataRequest] = Field(..., description="行情数据请求列表")
+    stream: bool = Field(False, description="是否以NDJSON流式返回，每完成一项返回一行")
+
+class BatchMarketDataItem(BaseModel):
+    """批量行情数据单项结果模型"""
+    index: int = Field(..., description="在请求列表中的序号")
+    symbol: str
+    timeframe: str
+    data: List[dict]
+    columns: Optional[Dict[str, list]] = Field(None, description="列式数据，仅format为columns时返回")
+    count: int
+    start_time: datetime
+    end_time: datetime
+    cached: bool = Field(False, description="是否命中缓存")
+    error: Optional[str] = Field(None, description="错误信息")
+
+class BatchMarketDataResponse(BaseModel):
+    """批量行情数据响应模型"""
+    results: List[BatchMarketDataItem]
+    count: int
+
+class ResampleMarketDataRequest(BaseModel):
+    """多周期合成行情数据请求模型"""
+    symbol: str = Field(..., description="交易品种", example="EURUSD")
+    timeframes: List[str] = Field(..., description="目标时间周期列表，支持M<n>/H<n>/D<n>/W1/MN1", example=["M5", "M15", "H1", "H4", "H12"])
+    base_timeframe: TimeframeEnum = Field(TimeframeEnum.M1, description="用于合成的基础时间周期", example="M1")
+    start_time: datetime = Field(..., description="开始时间", example="2024-01-01T00:00:00")
+    end_time: datetime = Field(..., description="结束时间", example="2024-01-02T00:00:00")
+
+class ResampleMarketDataResponse(BaseModel):
+    """多周期合成行情数据响应模型"""
+    symbol: str
+    base_timeframe: str
+    data: Dict[str, List[dict]]
+    count: Dict[str, int]
+    start_time: datetime
+    end_time: datetime
+
+class TickFlagsEnum(str, Enum):
+    """逐笔报价类型枚举"""
+    ALL = "all"
+    INFO = "info"
+    TRADE = "trade"
+
+class TickFieldEnum(str, Enum):
+    """逐笔报价字段枚举"""
+    TIME_MSC = "time_msc"
+    BID = "bid"
+    ASK = "ask"
+    LAST = "last"
+    VOLUME = "volume"
+    VOLUME_REAL = "volume_real"
+    FLAGS = "flags"
+
+class TickFormatEnum(str, Enum):
+    """逐笔报价流式输出格式枚举"""
+    NDJSON = "ndjson"
+    NPY = "npy"
+
+class TickDataRequest(BaseModel):
+    """逐笔报价请求模型"""
+    symbol: str = Field(..., description="交易品种", example="EURUSD")
+    start_time: datetime = Field(..., description="开始时间", example="2024-01-02T00:00:00")
+    end_time: datetime = Field(..., description="结束时间", example="2024-01-02T01:00:00")
+    flags: TickFlagsEnum = Field(TickFlagsEnum.ALL, description="报价类型：all全部，info买卖价变化，trade成交价变化")
+    fields: Optional[List[TickFieldEnum]] = Field(None, description="需要返回的字段，默认返回全部字段", example=["time_msc", "bid", "ask"])
+    format: TickFormatEnum = Field(TickFormatEnum.NDJSON, description="输出格式：ndjson每个时间片一行列式JSON，npy为连续的.npy数组")
+
+class BarTypeEnum(str, Enum):
+    """非时间K线类型枚举"""
+    TICK = "tick"
+    VOLUME = "volume"
+    RANGE = "range"
+    RENKO = "renko"
+    HEIKIN_ASHI = "heikin_ashi"
+
+class BarSourceEnum(str, Enum):
+    """非时间K线数据来源枚举"""
+    TICKS = "ticks"
+    M1 = "M1"
+
+class TickPriceEnum(str, Enum):
+    """逐笔报价取价方式枚举"""
+    BID = "bid"
+    ASK = "ask"
+    LAST = "last"
+    MID = "mid"
+
+class CustomBarsRequest(BaseModel):
+    """非时间K线请求模型"""
+    symbol: str = Field(..., description="交易品种", example="EURUSD")
+    bar_type: BarTypeEnum = Field(..., description="K线类型：tick、volume、range、renko、heikin_ashi", example="range")
+    size: Optional[float] = Field(None, gt=0, description="K线大小：tick为报价笔数，volume为成交量，range/renko为价格幅度", example=0.001)
+    source: BarSourceEnum = Field(BarSourceEnum.M1, description="数据来源：ticks逐笔报价或M1 K线")
+    price: TickPriceEnum = Field(TickPriceEnum.BID, description="逐笔报价取价方式，仅source为ticks时有效")
+    timeframe: TimeframeEnum = Field(TimeframeEnum.H1, description="heikin_ashi所基于的时间周期")
+    heikin_ashi: bool = Field(False, description="是否对生成的K线再做Heikin-Ashi变换")
+    start_time: datetime = Field(..., description="开始时间", example="2024-01-01T00:00:00")
+    end_time: datetime = Field(..., description="结束时间", example="2024-01-02T00:00:00")
+    indicators: List[str] = Field(default_factory=list, description="在生成的K线上计算的技术指标", example=["rsi", "atr"])
+    precision: Optional[int] = Field(None, ge=0, le=10, description="指标值输出的小数位数，默认使用交易品种的digits")
+    smoothing: SmoothingEnum = Field(SmoothingEnum.SMA, description="RSI/ATR/MFI的平滑方式：sma简单平均，wilder为Wilder平滑")
+    fields: Optional[List[MarketDataFieldEnum]] = Field(None, description="需要返回的字段，默认返回全部字段")
+    format: ResponseFormatEnum = Field(ResponseFormatEnum.RECORDS, description="响应结构：records按行返回data，columns按列返回columns")
+
+class CustomBarsResponse(BaseModel):
+    """非时间K线响应模型"""
+    symbol: str
+    bar_type: str
+    data: List[dict]
+    columns: Optional[Dict[str, list]] = Field(None, description="列式数据，仅format为columns时返回")
+    indicators: Dict[str, List[Optional[float]]] = Field(default_factory=dict, description="指标 -> 与K线等长的指标值序列")
     count: int
     start_time: datetime
     end_time: datetime
@@ -43,6 +192,17 @@ class HealthResponse(BaseModel):
     mt5_connected: bool
     timestamp: datetime
 
+class SymbolInfoResponse(BaseModel):
+    """交易品种元数据响应模型"""
+    name: str = Field(..., description="交易品种")
+    description: Optional[str] = Field(None, description="品种描述")
+    path: Optional[str] = Field(None, description="品种分组路径")
+    digits: int = Field(..., description="价格小数位数")
+    point: float = Field(..., description="最小价格变动")
+    currency_base: Optional[str] = Field(None, description="基础货币")
+    currency_profit: Optional[str] = Field(None, description="盈利货币")
+    trade_contract_size: Optional[float] = Field(None, description="合约大小")
+
 # 技术指标相关模型
 class TechnicalIndicatorRequest(BaseModel):
     """技术指标请求模型"""
@@ -51,6 +211,10 @@ class TechnicalIndicatorRequest(BaseModel):
     start_date: str = Field(..., description="开始日期", example="2025-08-01")
     end_date: str = Field(..., description="结束日期", example="2025-08-28")
     timeframe: TimeframeEnum = Field(..., description="时间周期", example="H1")
+    max_points: Optional[int] = Field(None, ge=3, description="每个指标最多返回的数据点数，超出时在服务端降采样", example=2000)
+    downsample_method: DownsampleMethodEnum = Field(DownsampleMethodEnum.LTTB, description="降采样方式：lttb或minmax")
+    precision: Optional[int] = Field(None, ge=0, le=10, description="指标值输出的小数位数，默认使用交易品种的digits")
+    smoothing: SmoothingEnum = Field(SmoothingEnum.SMA, description="RSI/ATR/MFI的平滑方式：sma简单平均，wilder为Wilder平滑")
 
 class TechnicalIndicatorValue(BaseModel):
     """技术指标值模型"""
@@ -66,6 +230,29 @@ class TechnicalIndicatorResponse(BaseModel):
     values: List[TechnicalIndicatorValue] = Field(..., description="指标值列表")
     metadata: Dict[str, Any] = Field(..., description="元数据")
 
+class IndicatorGroupRequest(BaseModel):
+    """多输出指标请求模型"""
+    symbol: str = Field(..., description="交易品种", example="XAUUSD")
+    indicator: str = Field(..., description="指标族名称或其任一输出名称", example="macd")
+    outputs: Optional[List[str]] = Field(None, description="只返回指定的输出，默认返回指标族的全部输出", example=["macd", "macds", "macdh"])
+    start_date: str = Field(..., description="开始日期", example="2025-08-01")
+    end_date: str = Field(..., description="结束日期", example="2025-08-28")
+    timeframe: TimeframeEnum = Field(..., description="时间周期", example="H1")
+    max_points: Optional[int] = Field(None, ge=3, description="最多返回的数据点数，超出时按第一个输出降采样，各输出共用所选时间点", example=2000)
+    downsample_method: DownsampleMethodEnum = Field(DownsampleMethodEnum.LTTB, description="降采样方式：lttb或minmax")
+    precision: Optional[int] = Field(None, ge=0, le=10, description="指标值输出的小数位数，默认使用交易品种的digits")
+    smoothing: SmoothingEnum = Field(SmoothingEnum.SMA, description="RSI/ATR/MFI的平滑方式：sma简单平均，wilder为Wilder平滑")
+
+class IndicatorGroupResponse(BaseModel):
+    """多输出指标响应模型，各输出共用一条时间轴"""
+    symbol: str = Field(..., description="交易品种")
+    indicator: str = Field(..., description="指标族名称")
+    timeframe: str = Field(..., description="时间周期")
+    dates: List[str] = Field(..., description="时间轴")
+    timestamps: List[int] = Field(..., description="时间轴时间戳")
+    values: Dict[str, List[Optional[float]]] = Field(..., description="输出名称 -> 指标值序列")
+    metadata: Dict[str, Any] = Field(..., description="元数据")
+
 class BatchTechnicalIndicatorRequest(BaseModel):
     """批量技术指标请求模型"""
     symbol: str = Field(..., description="交易品种", example="XAUUSD")
@@ -73,6 +260,10 @@ class BatchTechnicalIndicatorRequest(BaseModel):
     start_date: str = Field(..., description="开始日期", example="2025-08-01")
     end_date: str = Field(..., description="结束日期", example="2025-08-28")
     timeframe: TimeframeEnum = Field(..., description="时间周期", example="H1")
+    max_points: Optional[int] = Field(None, ge=3, description="每个指标最多返回的数据点数，超出时在服务端降采样", example=2000)
+    downsample_method: DownsampleMethodEnum = Field(DownsampleMethodEnum.LTTB, description="降采样方式：lttb或minmax")
+    precision: Optional[int] = Field(None, ge=0, le=10, description="指标值输出的小数位数，默认使用交易品种的digits")
+    smoothing: SmoothingEnum = Field(SmoothingEnum.SMA, description="RSI/ATR/MFI的平滑方式：sma简单平均，wilder为Wilder平滑")
 
 class BatchTechnicalIndicatorResponse(BaseModel):
     """批量技术指标响应模型"""
@@ -80,12 +271,101 @@ class BatchTechnicalIndicatorResponse(BaseModel):
     timeframe: str = Field(..., description="时间周期")
     indicators: Dict[str, List[TechnicalIndicatorValue]] = Field(..., description="指标值字典")
 
+class FillMethodEnum(str, Enum):
+    """缺失K线处理方式枚举"""
+    FFILL = "ffill"
+    NAN = "nan"
+
+class MultiSymbolIndicatorRequest(BaseModel):
+    """多品种技术指标请求模型"""
+    symbols: List[str] = Field(..., description="交易品种列表", example=["EURUSD", "GBPUSD", "XAUUSD"])
+    indicators: List[str] = Field(..., description="技术指标名称列表", example=["rsi", "atr"])
+    start_date: str = Field(..., description="开始日期", example="2025-08-01")
+    end_date: str = Field(..., description="结束日期", example="2025-08-28")
+    timeframe: TimeframeEnum = Field(..., description="时间周期", example="H1")
+    fill_method: FillMethodEnum = Field(FillMethodEnum.FFILL, description="缺失K线处理方式：ffill向前填充，nan保留空值")
+    precision: Optional[int] = Field(None, ge=0, le=10, description="指标值输出的小数位数，默认使用交易品种的digits")
+    smoothing: SmoothingEnum = Field(SmoothingEnum.SMA, description="RSI/ATR/MFI的平滑方式：sma简单平均，wilder为Wilder平滑")
+
+class MultiSymbolIndicatorResponse(BaseModel):
+    """多品种技术指标响应模型（按公共时间轴对齐的列式结构）"""
+    timeframe: str = Field(..., description="时间周期")
+    symbols: List[str] = Field(..., description="成功计算的交易品种列表")
+    dates: List[str] = Field(..., description="公共时间轴")
+    timestamps: List[int] = Field(..., description="公共时间轴时间戳")
+    indicators: Dict[str, Dict[str, List[Optional[float]]]] = Field(..., description="指标 -> 品种 -> 指标值序列")
+    errors: Dict[str, str] = Field(default_factory=dict, description="获取失败的品种及错误信息")
+
+class MatrixTypeEnum(str, Enum):
+    """矩阵类型枚举"""
+    CORRELATION = "correlation"
+    COVARIANCE = "covariance"
+
+class ReturnTypeEnum(str, Enum):
+    """收益率类型枚举"""
+    LOG = "log"
+    SIMPLE = "simple"
+
+class CorrelationRequest(BaseModel):
+    """相关系数/协方差矩阵请求模型"""
+    symbols: List[str] = Field(..., description="交易品种列表（至少2个）", example=["EURUSD", "GBPUSD", "XAUUSD"])
+    start_date: str = Field(..., description="开始日期", example="2025-08-01")
+    end_date: str = Field(..., description="结束日期", example="2025-08-28")
+    timeframe: TimeframeEnum = Field(..., description="时间周期", example="H1")
+    matrix: MatrixTypeEnum = Field(MatrixTypeEnum.CORRELATION, description="矩阵类型：correlation相关系数，covariance协方差")
+    returns: ReturnTypeEnum = Field(ReturnTypeEnum.LOG, description="收益率类型：log对数收益率，simple简单收益率")
+    window: Optional[int] = Field(None, ge=2, description="滚动窗口长度（收益率个数），不指定时使用全部样本", example=100)
+    span: Optional[float] = Field(None, gt=1, description="指数加权跨度（alpha=2/(span+1)），与window互斥", example=60)
+    points: int = Field(1, ge=1, le=500, description="返回最近多少个时间点的矩阵，默认只返回最新一个")
+    fill_method: FillMethodEnum = Field(FillMethodEnum.NAN, description="缺失K线处理方式：nan时存在缺失的行不参与计算，ffill向前填充（缺失处收益率为0）")
+    precision: Optional[int] = Field(None, ge=0, le=10, description="矩阵元素输出的小数位数，默认不舍入")
+
+class CorrelationResponse(BaseModel):
+    """相关系数/协方差矩阵响应模型"""
+    timeframe: str = Field(..., description="时间周期")
+    symbols: List[str] = Field(..., description="矩阵行列对应的交易品种")
+    dates: List[str] = Field(..., description="各矩阵对应的K线时间")
+    timestamps: List[int] = Field(..., description="各矩阵对应的K线时间戳")
+    matrices: List[List[List[Optional[float]]]] = Field(..., description="按时间顺序排列的矩阵")
+    observations: int = Field(..., description="参与计算的收益率个数")
+    errors: Dict[str, str] = Field(default_factory=dict, description="获取失败的品种及错误信息")
+
+class ScanModeEnum(str, Enum):
+    """扫描匹配方式"""
+    LAST = "last"
+    ALL = "all"
+
+class ScanRequest(BaseModel):
+    """条件扫描请求模型"""
+    symbols: List[str] = Field(..., description="交易品种列表", example=["EURUSD", "GBPUSD", "XAUUSD"])
+    condition: str = Field(..., max_length=500, description="条件表达式", example="rsi(14) < 30 and close > sma(200)")
+    start_date: str = Field(..., description="开始日期", example="2025-08-01")
+    end_date: str = Field(..., description="结束日期", example="2025-08-28")
+    timeframe: TimeframeEnum = Field(..., description="时间周期", example="H1")
+    mode: ScanModeEnum = Field(ScanModeEnum.LAST, description="匹配方式：last只检查每个品种的最后一根K线，all返回区间内全部满足条件的K线")
+    smoothing: SmoothingEnum = Field(SmoothingEnum.SMA, description="RSI/ATR/MFI的平滑方式：sma简单平均，wilder为Wilder平滑")
+
+class ScanMatch(BaseModel):
+    """单个品种的扫描结果"""
+    symbol: str = Field(..., description="交易品种")
+    dates: List[str] = Field(..., description="满足条件的K线时间")
+    timestamps: List[int] = Field(..., description="满足条件的K线时间戳")
+
+class ScanResponse(BaseModel):
+    """条件扫描响应模型，只包含满足条件的品种"""
+    timeframe: str = Field(..., description="时间周期")
+    condition: str = Field(..., description="条件表达式")
+    scanned: int = Field(..., description="成功扫描的品种数量")
+    matches: List[ScanMatch] = Field(..., description="满足条件的品种及时间点")
+    errors: Dict[str, str] = Field(default_factory=dict, description="获取失败的品种及错误信息")
+
 class SupportedIndicator(BaseModel):
     """支持的指标信息模型"""
     name: str = Field(..., description="指标名称")
     description: str = Field(..., description="指标描述")
     category: str = Field(..., description="指标分类")
     parameters: Dict[str, Any] = Field(..., description="指标参数")
+    group: str = Field(..., description="所属指标族，可用于/technical-indicators/group一次获取全部输出")
 
 class SupportedIndicatorsResponse(BaseModel):
     """支持的指标列表响应模型"""
@@ -0,0 +1,83 @@
+"""按请求的cProfile剖析
+
+剖析器只在事件循环线程上启用，覆盖请求被await的整个期间，因此：
+同一时间段内并发执行的其他请求在事件循环线程上的调用也会计入结果；
+获取队列线程、终端进程池与run_in_executor中执行的工作（包括实际的MT5调用）不会出现在结果中。
+结果中的scope字段标明这一范围。
+"""
+import cProfile
+import pstats
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from app.config import settings
+from app.utils import get_beijing_now
+
+# cProfile同一时刻只能有一个剖析器生效，并发的剖析请求直接跳过
+_active_lock = threading.Lock()
+
+# 剖析结果覆盖的范围
+PROFILE_SCOPE = "event-loop thread only"
+
+def start_profile() -> Optional[cProfile.Profile]:
+    """开始剖析，已有剖析进行中时返回None"""
+    if not _active_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def stop_profile(profiler: cProfile.Profile):
+    """结束剖析"""
+    try:
+        profiler.disable()
+    finally:
+        _active_lock.release()
+
+def top_functions(profiler: cProfile.Profile, limit: int) -> List[Dict]:
+    """按累计耗时排序，返回耗时最多的函数"""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "ncalls": ncalls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3)
+        }
+        for (filename, line, name), (_, ncalls, tottime, cumtime, _) in rows
+    ]
+
+class ProfileStore:
+    """最近剖析结果的内存存储"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, path: str, total_ms: float, functions: List[Dict]) -> str:
+        """保存剖析结果并返回其ID"""
+        profile_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[profile_id] = {
+                "id": profile_id,
+                "path": path,
+                "created_at": get_beijing_now().isoformat(),
+                "total_ms": round(total_ms, 3),
+                "scope": PROFILE_SCOPE,
+                "note": "包含同时段其他请求在事件循环线程上的调用，不包含获取队列线程、终端进程池与线程池中的工作（如MT5调用）",
+                "functions": functions
+            }
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        """获取剖析结果"""
+        with self._lock:
+            return self._entries.get(profile_id)
+
+# 全局剖析结果存储实例
+profile_store = ProfileStore(settings.profile_store_size)
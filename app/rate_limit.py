@@ -0,0 +1,139 @@
+"""按API密钥的令牌桶限流
+
+每个API密钥对应一个令牌桶，按请求成本扣减令牌。成本由时间周期、时间范围
+（即K线数量）与指标数量估算。令牌桶状态保存在可替换的存储中：
+memory仅在当前进程内生效；sqlite保存在本地文件中，同一主机上的多个uvicorn worker共享额度。
+"""
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from fastapi import Request
+from app.config import settings
+from app.exceptions import RateLimitExceededError
+from app.utils import TIMEFRAME_SECONDS
+
+class MemoryBucketStore:
+    """进程内令牌桶存储"""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def consume(self, bucket_id: str, cost: float, rate: float, capacity: float) -> Tuple[bool, float]:
+        """补充并扣减令牌，返回 (是否允许, 剩余令牌)"""
+        now = time.time()
+        with self._lock:
+            tokens, updated = self._buckets.get(bucket_id, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[bucket_id] = (tokens, now)
+        return allowed, tokens
+
+class SQLiteBucketStore:
+    """基于本地SQLite文件的令牌桶存储，同一主机上的多个进程共享"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (id TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, bucket_id: str, cost: float, rate: float, capacity: float) -> Tuple[bool, float]:
+        """补充并扣减令牌，返回 (是否允许, 剩余令牌)"""
+        conn = self._connect()
+        now = time.time()
+        # BEGIN IMMEDIATE 获取写锁，保证多进程下读-改-写的原子性
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE id = ?", (bucket_id,)).fetchone()
+            tokens, updated = row if row is not None else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (id, tokens, updated) VALUES (?, ?, ?)",
+                (bucket_id, tokens, now)
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens
+
+def create_bucket_store(store: str, path: str):
+    """按配置创建令牌桶存储"""
+    if store == "sqlite":
+        return SQLiteBucketStore(path)
+    if store == "memory":
+        return MemoryBucketStore()
+    raise ValueError(f"不支持的限流存储: {store}")
+
+def estimate_cost(timeframe: str, start_time: datetime, end_time: datetime, indicator_count: int = 0) -> float:
+    """估算请求成本：K线数量按RATE_LIMIT_BARS_PER_TOKEN折算，每个指标再计一份，最低为1"""
+    seconds = max(0.0, (end_time - start_time).total_seconds())
+    bars = seconds / TIMEFRAME_SECONDS.get(timeframe, 60)
+    return max(1.0, bars / settings.rate_limit_bars_per_token * (1 + indicator_count))
+
+def estimate_tick_cost(start_time: datetime, end_time: datetime) -> float:
+    """估算逐笔报价请求成本：每个时间片计一份，最低为1"""
+    seconds = max(0.0, (end_time - start_time).total_seconds())
+    return max(1.0, seconds / settings.tick_slice_seconds)
+
+class RateLimiter:
+    """API密钥令牌桶限流器"""
+
+    def __init__(self, store, limits: Dict[str, Tuple[float, float]]):
+        self.store = store
+        # {API密钥: (每秒补充令牌数, 桶容量)}
+        self.limits = limits
+
+    def consume(self, api_key: str, cost: float) -> Dict[str, str]:
+        """按成本扣减令牌并返回用量响应头，额度不足时抛出RateLimitExceededError"""
+        rate, capacity = self.limits.get(api_key, (settings.rate_limit_rate, settings.rate_limit_burst))
+        # 存储中只保存密钥摘要，不落盘明文密钥
+        bucket_id = hashlib.blake2b(api_key.encode(), digest_size=16).hexdigest()
+        # 成本超过桶容量的请求永远无法满足，按桶容量扣减
+        cost = min(cost, capacity)
+        allowed, tokens = self.store.consume(bucket_id, cost, rate, capacity)
+
+        headers = {
+            "X-RateLimit-Limit": str(int(capacity)),
+            "X-RateLimit-Remaining": str(int(tokens)),
+            "X-RateLimit-Reset": str(math.ceil((capacity - tokens) / rate)) if rate > 0 else "0",
+            "X-RateLimit-Cost": f"{cost:.2f}"
+        }
+        if not allowed:
+            retry_after = math.ceil((cost - tokens) / rate) if rate > 0 else 60
+            raise RateLimitExceededError(retry_after=max(1, retry_after), headers=headers)
+        return headers
+
+# 全局限流器实例
+rate_limiter = RateLimiter(
+    create_bucket_store(settings.rate_limit_store, settings.rate_limit_store_path),
+    settings.api_key_limits
+)
+
+def charge_request(request: Request, cost: float):
+    """对当前请求的API密钥计费，用量响应头由中间件写入响应"""
+    api_key: Optional[str] = getattr(request.state, "api_key", None)
+    if not settings.rate_limit_enabled or api_key is None:
+        return
+    request.state.rate_limit_headers = rate_limiter.consume(api_key, cost)
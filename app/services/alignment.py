@@ -0,0 +1,45 @@
+import numpy as np
+from typing import Dict, List, Tuple
+
+# 对齐后输出的K线字段
+ALIGNED_FIELDS = ("open", "high", "low", "close", "tick_volume")
+
+def align_rates(rates_list: List[np.ndarray], fill_method: str = "ffill") -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """将多个品种的MT5原始K线数组按时间戳对齐为二维数组
+
+    返回 (公共时间戳数组 (T,), {字段: (T, S) 数组})。
+    fill_method 为 "ffill" 时，缺失K线的开高低收取前一根收盘价、成交量为0；
+    为 "nan" 时缺失K线保持NaN。品种首根K线之前始终为NaN。
+    """
+    non_empty = [rates['time'] for rates in rates_list if len(rates) > 0]
+    if non_empty:
+        times = np.unique(np.concatenate(non_empty)).astype(np.int64)
+    else:
+        times = np.empty(0, dtype=np.int64)
+
+    shape = (len(times), len(rates_list))
+    fields = {name: np.full(shape, np.nan) for name in ALIGNED_FIELDS}
+    present = np.zeros(shape, dtype=bool)
+
+    for col, rates in enumerate(rates_list):
+        if len(rates) == 0:
+            continue
+        rows = np.searchsorted(times, rates['time'])
+        present[rows, col] = True
+        for name in ALIGNED_FIELDS:
+            fields[name][rows, col] = rates[name]
+
+    if fill_method == "ffill" and len(times) > 0:
+        # 每列记录最近一根真实K线所在行，用于向前填充收盘价
+        row_index = np.where(present, np.arange(len(times))[:, None], 0)
+        np.maximum.accumulate(row_index, axis=0, out=row_index)
+        filled_close = np.take_along_axis(fields["close"], row_index, axis=0)
+        started = np.maximum.accumulate(present, axis=0)
+        missing = started & ~present
+
+        fields["close"] = np.where(missing, filled_close, fields["close"])
+        for name in ("open", "high", "low"):
+            fields[name] = np.where(missing, filled_close, fields[name])
+        fields["tick_volume"] = np.where(missing, 0.0, fields["tick_volume"])
+
+    return times, fields
@@ -0,0 +1,89 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Hashable
+
+import numpy as np
+from app.metrics import CACHE_REQUESTS
+
+class BarCacheEntry:
+    """K线缓存条目"""
+
+    __slots__ = ("rates", "closed", "created_at", "modified_at", "version", "_digest")
+
+    def __init__(self, rates: np.ndarray, closed: bool, version: int):
+        self.rates = rates
+        self.closed = closed
+        self.created_at = time.monotonic()
+        self.modified_at = time.time()
+        self.version = version
+        self._digest = None
+
+    @property
+    def digest(self) -> str:
+        """K线内容摘要，内容不变时跨进程、跨重启保持一致"""
+        if self._digest is None:
+            self._digest = hashlib.blake2b(self.rates.tobytes(), digest_size=16).hexdigest()
+        return self._digest
+
+class BarCache:
+    """K线内存缓存（LRU）
+
+    缓存MT5返回的原始rates数组。已完全收盘的历史区间永不过期，
+    包含未收盘K线的区间按TTL过期。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, BarCacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[BarCacheEntry]:
+        """获取缓存条目，未命中或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.closed and time.monotonic() - entry.created_at > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="bar", result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="bar", result="hit")
+            return entry
+
+    def put(self, key: Hashable, rates: np.ndarray, closed: bool) -> BarCacheEntry:
+        """写入缓存条目"""
+        with self._lock:
+            self._version += 1
+            entry = BarCacheEntry(rates, closed, self._version)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    def contains(self, key: Hashable) -> bool:
+        """判断缓存中是否存在有效条目（不计入命中统计）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            return entry.closed or time.monotonic() - entry.created_at <= self.ttl
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Tuple[int, int, int]:
+        """返回 (条目数, 命中次数, 未命中次数)"""
+        with self._lock:
+            return len(self._entries), self.hits, self.misses
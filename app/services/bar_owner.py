@@ -0,0 +1,213 @@
+"""MT5属主进程
+
+多worker部署（MT5_MODE=shared）时，只有属主进程连接MT5终端。HTTP worker经本地连接发送获取请求，
+属主进程通过获取队列串行访问终端，把K线写入共享K线存储后返回，worker再直接从存储读取。
+
+启动方式：python -m app.services.bar_owner
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from app import exceptions
+from app.config import settings
+from app.exceptions import DataRetrievalError, MT5ConnectionError
+from app.services.bar_store import SharedBarStore
+
+logger = logging.getLogger(__name__)
+
+# 共享存储清理间隔（秒）
+PRUNE_INTERVAL = 60
+
+def _owner_address() -> Tuple[str, int]:
+    """属主进程监听地址"""
+    return (settings.bar_owner_host, settings.bar_owner_port)
+
+def encode_error(e: Exception) -> Tuple:
+    """将异常编码为可跨进程传递的元组"""
+    if isinstance(e, HTTPException):
+        return ("error", type(e).__name__, e.status_code, e.detail, getattr(e, "headers", None))
+    return ("error", "DataRetrievalError", 500, f"获取行情数据失败: {str(e)}", None)
+
+def decode_error(name: str, status_code: int, detail: str, headers: Optional[Dict]) -> HTTPException:
+    """还原属主进程返回的异常，保持原异常类型以便接口层按类型处理"""
+    cls = getattr(exceptions, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, HTTPException)):
+        cls = DataRetrievalError
+    exc = cls.__new__(cls)
+    HTTPException.__init__(exc, status_code=status_code, detail=detail, headers=headers)
+    return exc
+
+class BarOwnerServer:
+    """属主进程服务端"""
+
+    def __init__(self, service, store: SharedBarStore):
+        # service为本地模式的MT5Service，独占终端连接
+        self.service = service
+        self.store = store
+        self._inflight: Dict[Tuple, Future] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, symbol: str, timeframe: str, mt5_start, mt5_end, closed: bool, priority: int, timeout: Optional[float]):
+        """获取K线并写入共享存储，相同区间的并发请求共享同一次终端调用"""
+        key = (symbol, timeframe, mt5_start, mt5_end)
+        if self.store.contains(key):
+            return
+        with self._lock:
+            published = self._inflight.get(key)
+            first = published is None
+            if first:
+                published = Future()
+                self._inflight[key] = published
+
+        if first:
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            try:
+                future = self.service.submit_fetch(*key, priority, deadline)
+            except Exception as e:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                published.set_exception(e)
+            else:
+                future.add_done_callback(lambda f: self._publish(key, closed, f, published))
+        published.result()
+
+    def _publish(self, key: Tuple, closed: bool, future: Future, published: Future):
+        """终端调用完成后写入共享存储，再通知等待方"""
+        try:
+            self.store.put(key, future.result(), closed)
+            published.set_result(None)
+        except BaseException as e:
+            published.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def handle(self, op: str, args: tuple):
+        """处理单个请求"""
+        if op == "fetch":
+            return self.fetch(*args)
+        if op == "ticks":
+            # 逐笔报价按时间片获取，数据量有界，直接经连接返回而不写入共享存储
+            symbol, mt5_start, mt5_end, flags, priority, timeout = args
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            return self.service.submit_ticks(symbol, mt5_start, mt5_end, flags, priority, deadline).result()
+        if op == "ping":
+            return self.service.is_connected()
+        if op == "symbols":
+            return self.service.load_symbol_infos()
+        raise DataRetrievalError(f"不支持的操作: {op}")
+
+    def _serve_connection(self, conn):
+        """处理一个worker连接上的请求"""
+        with conn:
+            while True:
+                try:
+                    op, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self.handle(op, args))
+                except Exception as e:
+                    reply = encode_error(e)
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return
+
+    def _prune_loop(self):
+        """定期清理共享存储"""
+        while True:
+            time.sleep(PRUNE_INTERVAL)
+            try:
+                self.store.prune()
+            except Exception:
+                logger.exception("清理共享K线存储失败")
+
+    def serve_forever(self):
+        """监听并处理worker连接"""
+        threading.Thread(target=self._prune_loop, name="bar-store-prune", daemon=True).start()
+        with Listener(_owner_address(), authkey=settings.bar_owner_authkey.encode()) as listener:
+            logger.info("MT5属主进程已启动，监听 %s:%s", *_owner_address())
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    logger.exception("接受worker连接失败")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+class BarOwnerClient:
+    """HTTP worker侧的属主进程客户端（连接池，线程安全）"""
+
+    def __init__(self, address: Tuple[str, int], authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._pool: "queue.LifoQueue" = queue.LifoQueue()
+
+    def call(self, op: str, *args):
+        """发送请求并等待结果"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+            except Exception as e:
+                raise MT5ConnectionError(f"MT5属主进程不可用: {str(e)}")
+
+        try:
+            conn.send((op, args))
+            reply = conn.recv()
+        except Exception as e:
+            conn.close()
+            raise MT5ConnectionError(f"与MT5属主进程通信失败: {str(e)}")
+
+        self._pool.put(conn)
+        if reply[0] == "error":
+            raise decode_error(*reply[1:])
+        return reply[1]
+
+    def fetch(self, symbol: str, timeframe: str, mt5_start, mt5_end, closed: bool, priority: int, timeout: Optional[float]):
+        """请求属主进程获取K线并写入共享存储"""
+        self.call("fetch", symbol, timeframe, mt5_start, mt5_end, closed, priority, timeout)
+
+    def fetch_ticks(self, symbol: str, mt5_start, mt5_end, flags: str, priority: int, timeout: Optional[float]):
+        """请求属主进程获取一个时间片内的逐笔报价"""
+        return self.call("ticks", symbol, mt5_start, mt5_end, flags, priority, timeout)
+
+    def get_symbol_infos(self) -> List[Dict]:
+        """获取交易品种元数据"""
+        return self.call("symbols")
+
+    def is_connected(self) -> bool:
+        """属主进程的MT5连接状态"""
+        try:
+            return self.call("ping")
+        except MT5ConnectionError:
+            return False
+
+    def close(self):
+        """关闭连接池中的连接"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+def main():
+    """启动属主进程"""
+    from app.services.mt5_service import MT5Service
+
+    logging.basicConfig(level=logging.INFO)
+    # 属主进程与worker通常共用同一份配置（MT5_MODE=shared），属主自建本地模式实例独占终端，
+    # 不使用全局实例，避免其品种目录刷新等请求连接到属主进程自身
+    service = MT5Service(mode="local")
+    store = SharedBarStore(settings.bar_store_dir, settings.bar_cache_ttl, settings.bar_store_max_bytes)
+    BarOwnerServer(service, store).serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Hashable, Optional
+
+import numpy as np
+from app.metrics import CACHE_REQUESTS
+from app.services.bar_cache import BarCacheEntry
+
+class SharedBarStore:
+    """跨进程共享的K线存储（内存映射文件）
+
+    由MT5属主进程写入，同一主机上的HTTP worker直接读取，每个区间保存为一个.npy文件。
+    已收盘区间写入后不再变化，以只读内存映射方式打开，各进程共享同一份页缓存；
+    包含未收盘K线的区间会被覆盖写入，读取时复制到内存，按文件修改时间与TTL判断过期。
+    """
+
+    def __init__(self, directory: str, ttl: float = 5.0, max_bytes: int = 1073741824):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _base_path(self, key: Hashable) -> str:
+        """由缓存键生成文件路径前缀"""
+        name = hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, name)
+
+    def get(self, key: Hashable) -> Optional[BarCacheEntry]:
+        """读取K线，未命中或已过期时返回None"""
+        base = self._base_path(key)
+        entry = self._load(base + ".closed.npy", closed=True)
+        if entry is None:
+            entry = self._load(base + ".live.npy", closed=False)
+        CACHE_REQUESTS.inc(cache="shared", result="miss" if entry is None else "hit")
+        return entry
+
+    def contains(self, key: Hashable) -> bool:
+        """判断存储中是否存在有效数据（不计入命中统计）"""
+        base = self._base_path(key)
+        if os.path.exists(base + ".closed.npy"):
+            return True
+        try:
+            return time.time() - os.path.getmtime(base + ".live.npy") <= self.ttl
+        except OSError:
+            return False
+
+    def _load(self, path: str, closed: bool) -> Optional[BarCacheEntry]:
+        """加载单个文件"""
+        try:
+            modified_at = os.path.getmtime(path)
+            if not closed and time.time() - modified_at > self.ttl:
+                return None
+            if closed:
+                try:
+                    rates = np.load(path, mmap_mode="r")
+                except ValueError:
+                    # 空数组无法内存映射
+                    rates = np.load(path)
+            else:
+                rates = np.load(path)
+        except (FileNotFoundError, EOFError):
+            return None
+
+        entry = BarCacheEntry(rates, closed, 0)
+        entry.modified_at = modified_at
+        return entry
+
+    def put(self, key: Hashable, rates: np.ndarray, closed: bool):
+        """写入K线（先写临时文件再原子替换，读取方不会看到写了一半的文件）"""
+        base = self._base_path(key)
+        path = base + (".closed.npy" if closed else ".live.npy")
+        if closed and os.path.exists(path):
+            return
+
+        tmp_path = f"{base}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, rates)
+
+        for attempt in range(5):
+            try:
+                os.replace(tmp_path, path)
+                return
+            except PermissionError:
+                # Windows下目标文件正被其他进程读取时无法替换，稍后重试
+                time.sleep(0.01 * (attempt + 1))
+        os.remove(tmp_path)
+
+    def prune(self):
+        """总大小超过上限时按修改时间删除最旧的文件"""
+        files = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for item in it:
+                if not item.name.endswith(".npy"):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # 仍被内存映射的文件在Windows下无法删除，跳过
+                continue
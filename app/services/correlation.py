@@ -0,0 +1,104 @@
+"""多品种收益率相关系数与协方差矩阵
+
+在按时间戳对齐的收盘价 (T, S) 上计算收益率，对存在缺失值的行整行剔除。
+权重方式：全样本（扩展窗口）、滚动窗口或指数加权（span，与EMA一致的alpha=2/(span+1)）。
+连续多个时间点的矩阵按加权一阶、二阶矩递推得到，每个时间点只需 O(S^2) 的更新。
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+import numpy as np
+
+def compute_returns(close: np.ndarray, kind: str = "log") -> np.ndarray:
+    """由收盘价计算收益率 (T-1, S)，kind为log或simple"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if kind == "log":
+            return np.diff(np.log(close), axis=0)
+        return close[1:] / close[:-1] - 1
+
+def _weighted_moments(x: np.ndarray, weights: np.ndarray):
+    """加权矩：返回 (权重和, 权重平方和, 一阶矩 (S,), 二阶矩 (S, S))"""
+    return weights.sum(), (weights ** 2).sum(), weights @ x, np.einsum('t,ts,tu->su', weights, x, x)
+
+def _covariance(w0: float, w2: float, m1: np.ndarray, m2: np.ndarray) -> np.ndarray:
+    """由加权矩计算无偏加权协方差：sum w (x-mu)(x-mu)^T / (W0 - W2/W0)"""
+    denominator = w0 - w2 / w0
+    if denominator <= 0:
+        return np.full(m2.shape, np.nan)
+    return (m2 - np.outer(m1, m1) / w0) / denominator
+
+def covariance_series(
+    returns: np.ndarray,
+    points: int = 1,
+    window: Optional[int] = None,
+    span: Optional[float] = None
+) -> np.ndarray:
+    """计算最后points个时间点的协方差矩阵 (P, S, S)
+
+    window为滚动窗口长度，span为指数加权跨度，均未指定时使用截至各时间点的全部样本。
+    调用方需保证returns不含NaN且行数不少于points（滚动时不少于window + points - 1）。
+    """
+    # 减去列均值降低二阶矩相减时的精度损失，协方差不受平移影响
+    x = returns - returns.mean(axis=0)
+    length = len(x)
+    first = length - points
+    decay = 1 - 2 / (span + 1) if span is not None else 1.0
+
+    start = first - window + 1 if window is not None else 0
+    weights = decay ** np.arange(first - start, -1, -1, dtype=float)
+    w0, w2, m1, m2 = _weighted_moments(x[start:first + 1], weights)
+
+    out = np.empty((points,) + m2.shape)
+    out[0] = _covariance(w0, w2, m1, m2)
+    for p, end in enumerate(range(first + 1, length), start=1):
+        row = x[end]
+        w0, w2 = decay * w0 + 1, decay ** 2 * w2 + 1
+        m1 = decay * m1 + row
+        m2 = decay * m2 + np.outer(row, row)
+        if window is not None:
+            # 滚动窗口移出最早的一行
+            old = x[end - window]
+            w0, w2 = w0 - 1, w2 - 1
+            m1 = m1 - old
+            m2 = m2 - np.outer(old, old)
+        out[p] = _covariance(w0, w2, m1, m2)
+    return out
+
+def correlation_from_covariance(cov: np.ndarray) -> np.ndarray:
+    """协方差矩阵 (..., S, S) 转换为相关系数矩阵，方差为0的品种对应NaN"""
+    std = np.sqrt(np.diagonal(cov, axis1=-2, axis2=-1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / (std[..., :, None] * std[..., None, :])
+    corr = np.clip(corr, -1.0, 1.0)
+    diagonal = np.einsum('...ii->...i', corr)
+    diagonal[...] = np.where(std > 0, 1.0, np.nan)
+    return corr
+
+class MatrixCache:
+    """矩阵结果的LRU缓存
+
+    键中包含参与计算的最后一根已收盘K线时间，新K线收盘后键随之变化，因此条目无需单独失效。
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Tuple]:
+        """获取缓存结果"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Tuple):
+        """写入结果，超出容量时淘汰最久未使用的条目"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
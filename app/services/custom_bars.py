@@ -0,0 +1,210 @@
+"""非时间K线聚合
+
+由逐笔报价或M1 K线构建Tick K线、成交量K线、区间K线与Renko砖块，并支持Heikin-Ashi变换。
+输出与MT5原始K线数组同结构，可直接复用行情转换与技术指标计算。
+分组边界尽量向量化检测；区间K线与Renko依赖路径，按块向前查找越界位置，循环次数与K线数量成正比。
+"""
+import numpy as np
+from typing import Optional, Tuple
+from app.exceptions import InvalidTimeframeError
+from app.services.resampler import aggregate_groups
+
+# 与MT5 copy_rates_range返回的数组结构一致
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+    ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')
+])
+
+BAR_TYPES = ("tick", "volume", "range", "renko", "heikin_ashi")
+
+# 浮点比较容差（相对于K线大小）
+_EPSILON = 1e-9
+
+# 向前查找越界位置的初始块大小
+_CHUNK = 256
+
+def ticks_to_rows(ticks: np.ndarray, price: str = "bid") -> np.ndarray:
+    """将逐笔报价转换为单点K线数组（开高低收均为报价，tick_volume为1），价格为0的报价被丢弃"""
+    if price == "mid":
+        prices = (ticks['bid'] + ticks['ask']) / 2
+    else:
+        prices = ticks[price].astype(float)
+    valid = prices > 0
+
+    rows = np.zeros(int(valid.sum()), dtype=RATES_DTYPE)
+    rows['time'] = ticks['time_msc'][valid] // 1000
+    for field in ('open', 'high', 'low', 'close'):
+        rows[field] = prices[valid]
+    rows['tick_volume'] = 1
+    rows['real_volume'] = ticks['volume'][valid]
+    return rows
+
+def _volume_closes(volume: np.ndarray, size: float, offset: float = 0.0) -> np.ndarray:
+    """累计量每跨过一个size的整数倍即收线，返回收线所在行的下标
+
+    offset为之前已收线K线超出整数倍的部分，使增量追加与一次性计算的边界一致。
+    """
+    volume = volume.astype(float)
+    cumulative = offset + np.cumsum(volume)
+    return np.flatnonzero(np.floor(cumulative / size + _EPSILON) > np.floor((cumulative - volume) / size + _EPSILON))
+
+def _range_closes(high: np.ndarray, low: np.ndarray, size: float) -> np.ndarray:
+    """区间（最高-最低）达到size即收线，返回收线所在行的下标"""
+    closes = []
+    threshold = size * (1 - _EPSILON)
+    start, chunk, n = 0, _CHUNK, len(high)
+    while start < n:
+        end = min(n, start + chunk)
+        span = np.maximum.accumulate(high[start:end]) - np.minimum.accumulate(low[start:end])
+        hit = np.flatnonzero(span >= threshold)
+        if len(hit) > 0:
+            closes.append(start + hit[0])
+            start += hit[0] + 1
+            # 下一块大小参考本根K线长度
+            chunk = max(_CHUNK, 2 * (hit[0] + 1))
+        elif end == n:
+            break
+        else:
+            chunk *= 2
+    return np.asarray(closes, dtype=np.int64)
+
+def _first_crossing(close: np.ndarray, start: int, upper: float, lower: float) -> int:
+    """查找start之后收盘价首次达到upper或lower的行下标，不存在时返回-1"""
+    chunk, n = _CHUNK, len(close)
+    while start < n:
+        end = min(n, start + chunk)
+        window = close[start:end]
+        hit = np.flatnonzero((window >= upper) | (window <= lower))
+        if len(hit) > 0:
+            return start + hit[0]
+        start, chunk = end, chunk * 2
+    return -1
+
+def _renko(rows: np.ndarray, size: float, state: Optional[Tuple[float, int]]):
+    """按收盘价生成Renko砖块
+
+    state为 (最后一块砖的收盘价, 方向)，同向延续需移动1个size，反转需移动2个size。
+    返回 (砖块数组, 最后一个成砖行的下标, 新状态)。
+    """
+    close = rows['close']
+    if state is None:
+        state = (np.floor(close[0] / size) * size, 0)
+    base, direction = state
+
+    bricks, last_close, cursor = [], -1, 0
+    while True:
+        upper = base + size * (2 if direction < 0 else 1) - size * _EPSILON
+        lower = base - size * (2 if direction > 0 else 1) + size * _EPSILON
+        index = _first_crossing(close, cursor, upper, lower)
+        if index < 0:
+            break
+
+        price = close[index]
+        if price >= upper:
+            origin = base + size if direction < 0 else base
+            count = int(np.floor((price - origin) / size + _EPSILON))
+            levels = origin + size * np.arange(count + 1)
+            opens, closes, direction = levels[:-1], levels[1:], 1
+        else:
+            origin = base - size if direction > 0 else base
+            count = int(np.floor((origin - price) / size + _EPSILON))
+            levels = origin - size * np.arange(count + 1)
+            opens, closes, direction = levels[:-1], levels[1:], -1
+        base = closes[-1]
+
+        # 本组行的成交量计入第一块砖，同一行生成的其余砖块成交量为0
+        group = np.zeros(count, dtype=RATES_DTYPE)
+        group['time'] = rows['time'][index]
+        group['open'] = opens
+        group['close'] = closes
+        group['high'] = np.maximum(opens, closes)
+        group['low'] = np.minimum(opens, closes)
+        group['tick_volume'][0] = rows['tick_volume'][cursor:index + 1].sum()
+        group['real_volume'][0] = rows['real_volume'][cursor:index + 1].sum()
+        group['spread'] = rows['spread'][cursor:index + 1].min()
+        bricks.append(group)
+        last_close, cursor = index, index + 1
+
+    bars = np.concatenate(bricks) if bricks else np.empty(0, dtype=RATES_DTYPE)
+    return bars, last_close, (base, direction)
+
+def heikin_ashi(bars: np.ndarray, state: Optional[Tuple[float, float]] = None):
+    """Heikin-Ashi变换，state为上一根平均K线的 (开盘, 收盘)，返回 (变换后的数组, 新状态)"""
+    if len(bars) == 0:
+        return bars, state
+
+    out = bars.copy()
+    ha_close = (bars['open'] + bars['high'] + bars['low'] + bars['close']) / 4
+    ha_open = np.empty(len(bars))
+    # 开盘价为上一根平均K线开收盘的均值，属于递推关系，逐根计算
+    prev_open, prev_close = state if state is not None else (bars['open'][0], bars['close'][0])
+    for i in range(len(bars)):
+        prev_open = (prev_open + prev_close) / 2
+        ha_open[i] = prev_open
+        prev_close = ha_close[i]
+
+    out['open'] = ha_open
+    out['close'] = ha_close
+    out['high'] = np.maximum(bars['high'], np.maximum(ha_open, ha_close))
+    out['low'] = np.minimum(bars['low'], np.minimum(ha_open, ha_close))
+    return out, (ha_open[-1], ha_close[-1])
+
+class BarBuilder:
+    """非时间K线增量构建器
+
+    extend追加新数据（单点K线或M1 K线）并返回新收线的K线，未收线部分保留到下次追加；
+    flush返回当前未收线的K线（Renko砖块只在成砖时产生，未成砖部分不返回）。
+    """
+
+    def __init__(self, bar_type: str, size: Optional[float] = None, smooth: bool = False):
+        if bar_type not in BAR_TYPES:
+            raise InvalidTimeframeError(f"不支持的K线类型: {bar_type}")
+        if bar_type != "heikin_ashi" and (size is None or size <= 0):
+            raise InvalidTimeframeError(f"{bar_type} K线需要指定大于0的size")
+        self.bar_type = bar_type
+        self.size = size
+        # heikin_ashi类型本身即为Heikin-Ashi变换，其他类型可选叠加
+        self.smooth = smooth or bar_type == "heikin_ashi"
+        self._tail = np.empty(0, dtype=RATES_DTYPE)
+        self._volume_offset = 0.0
+        self._renko_state: Optional[Tuple[float, int]] = None
+        self._ha_state: Optional[Tuple[float, float]] = None
+
+    def _split(self, rows: np.ndarray) -> Tuple[np.ndarray, int]:
+        """返回 (已收线的K线, 最后一根已收线K线的末行下标)"""
+        if self.bar_type == "heikin_ashi":
+            return rows, len(rows) - 1
+        if self.bar_type == "renko":
+            bars, last, self._renko_state = _renko(rows, self.size, self._renko_state)
+            return bars, last
+
+        if self.bar_type == "range":
+            closes = _range_closes(rows['high'], rows['low'], self.size)
+        else:
+            volume = rows['tick_volume' if self.bar_type == "tick" else 'real_volume']
+            closes = _volume_closes(volume, self.size, self._volume_offset)
+            if len(closes) > 0:
+                self._volume_offset = (self._volume_offset + volume[:closes[-1] + 1].sum()) % self.size
+        if len(closes) == 0:
+            return np.empty(0, dtype=RATES_DTYPE), -1
+        return aggregate_groups(rows[:closes[-1] + 1], np.r_[0, closes[:-1] + 1]), closes[-1]
+
+    def extend(self, rows: np.ndarray) -> np.ndarray:
+        """追加数据，返回新收线的K线"""
+        if len(rows) == 0:
+            return np.empty(0, dtype=RATES_DTYPE)
+        rows = np.concatenate([self._tail, rows.astype(RATES_DTYPE, copy=False)])
+        bars, last = self._split(rows)
+        self._tail = rows[last + 1:]
+        if self.smooth:
+            bars, self._ha_state = heikin_ashi(bars, self._ha_state)
+        return bars
+
+    def flush(self) -> np.ndarray:
+        """返回当前未收线的K线（不改变构建器状态）"""
+        if len(self._tail) == 0 or self.bar_type == "renko":
+            return np.empty(0, dtype=RATES_DTYPE)
+        bar = aggregate_groups(self._tail, np.array([0]))
+        if self.smooth:
+            bar, _ = heikin_ashi(bar, self._ha_state)
+        return bar
@@ -0,0 +1,109 @@
+"""图表降采样
+
+lttb：Largest-Triangle-Three-Buckets，保留曲线形状，并强制保留全局最高/最低点；
+minmax：按桶保留极值。K线按桶合并为一根（开/高/低/收/量），单条序列按桶保留最小值与最大值点。
+"""
+import numpy as np
+from app.services.resampler import aggregate_groups
+
+def _bucket_edges(n: int, max_points: int) -> np.ndarray:
+    """LTTB的桶边界：首尾点固定，中间划分为 max_points-2 个桶"""
+    return np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """LTTB降采样，返回保留点的下标（升序）"""
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = _bucket_edges(n, max_points)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    return selected
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """按桶保留最小值与最大值点，返回保留点的下标（升序）"""
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+
+    buckets = max_points // 2
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    valid = ~np.all(np.isnan(padded), axis=1)
+
+    offsets = np.arange(buckets)[valid] * size
+    mins = offsets + np.nanargmin(padded[valid], axis=1)
+    maxs = offsets + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate([mins, maxs]))
+
+def _with_extremes(indices: np.ndarray, extremes, n: int) -> np.ndarray:
+    """在LTTB结果中补入缺失的极值点，点数保持不变
+
+    缺失的极值替换其所在桶的选中点；两个极值落在同一桶时，后一个替换距离最近的其他选中点
+    （max_points为3、没有其他中间点时替换首点）。
+    """
+    indices = indices.copy()
+    edges = _bucket_edges(n, len(indices))
+    # 首尾点与已放入的极值不可被替换
+    fixed = {0, len(indices) - 1}
+    for extreme in dict.fromkeys(extremes):
+        found = np.flatnonzero(indices == extreme)
+        if len(found) > 0:
+            fixed.add(int(found[0]))
+            continue
+        position = int(np.searchsorted(edges, extreme, side="right"))
+        if position in fixed:
+            candidates = [p for p in range(1, len(indices) - 1) if p not in fixed]
+            position = min(candidates, key=lambda p: abs(int(indices[p]) - extreme)) if candidates else 0
+        indices[position] = extreme
+        fixed.add(position)
+    return np.sort(indices)
+
+def downsample_series(x: np.ndarray, y: np.ndarray, max_points: int, method: str = "lttb") -> np.ndarray:
+    """对单条序列降采样，返回保留点的下标"""
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+
+    indices = lttb_indices(x, y, max_points)
+    if len(indices) == len(y):
+        return indices
+    # LTTB不保证保留极值，补入全局最高/最低点
+    return _with_extremes(indices, [int(np.argmax(y)), int(np.argmin(y))], len(y))
+
+def downsample_rates(rates: np.ndarray, max_points: int, method: str = "lttb") -> np.ndarray:
+    """对MT5原始K线数组降采样，返回同结构的数组"""
+    n = len(rates)
+    if not max_points or n <= max_points:
+        return rates
+
+    if method == "minmax":
+        # 每桶合并为一根K线，完整保留桶内最高价与最低价
+        starts = np.unique(np.linspace(0, n, max_points, endpoint=False).astype(np.int64))
+        return aggregate_groups(rates, starts)
+
+    indices = lttb_indices(rates['time'], rates['close'], max_points)
+    # 补入最高价与最低价所在K线
+    extremes = [int(np.argmax(rates['high'])), int(np.argmin(rates['low']))]
+    return rates[_with_extremes(indices, extremes, n)]
@@ -0,0 +1,122 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from concurrent.futures import Future
+from contextvars import ContextVar
+from typing import Callable, Optional
+from app.exceptions import ServiceOverloadedError
+from app.metrics import FETCH_REJECTIONS
+
+# 优先级：数值越小越先执行。包含未收盘K线的实时请求优先于历史回补
+PRIORITY_LIVE = 0
+PRIORITY_HISTORICAL = 1
+
+# 当前请求的截止时间（time.monotonic()），由中间件设置
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class FetchQueue:
+    """MT5获取队列
+
+    MT5终端不支持并发调用，所有终端请求由单个工作线程按优先级串行执行。
+    入队时进行准入控制：队列已满，或按平均耗时估算无法在截止时间前开始的请求
+    直接以503拒绝；出队时已过截止时间或已被取消的请求不再执行。
+    """
+
+    def __init__(self, max_depth: int = 100, initial_duration: float = 0.05, name: str = "mt5-fetch"):
+        self.max_depth = max_depth
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        # 单次终端调用耗时的指数移动平均（秒）
+        self._avg_duration = initial_duration
+        self._running = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def depth(self) -> int:
+        """当前排队请求数"""
+        with self._cond:
+            return len(self._heap)
+
+    def _estimated_wait(self, priority: int) -> float:
+        """估算指定优先级的新请求开始执行前需要等待的时间（需持有锁）"""
+        ahead = sum(1 for item in self._heap if item[0] <= priority)
+        if self._running:
+            ahead += 1
+        return ahead * self._avg_duration
+
+    def _retry_after(self) -> int:
+        """建议的重试间隔（秒，需持有锁）"""
+        return max(1, math.ceil((len(self._heap) + 1) * self._avg_duration))
+
+    def submit(self, fn: Callable, *args, priority: int = PRIORITY_HISTORICAL, deadline: Optional[float] = None) -> Future:
+        """提交终端调用，返回concurrent.futures.Future；无法准入时抛出ServiceOverloadedError"""
+        with self._cond:
+            if len(self._heap) >= self.max_depth:
+                FETCH_REJECTIONS.inc(reason="queue_full")
+                raise ServiceOverloadedError(
+                    f"MT5获取队列已满（{self.max_depth}），请稍后重试",
+                    retry_after=self._retry_after()
+                )
+            if deadline is not None and time.monotonic() + self._estimated_wait(priority) > deadline:
+                FETCH_REJECTIONS.inc(reason="deadline")
+                raise ServiceOverloadedError(
+                    "MT5获取队列繁忙，请求无法在截止时间前开始",
+                    retry_after=self._retry_after()
+                )
+
+            future = Future()
+            item = (priority, next(self._seq), deadline, future, fn, args)
+            heapq.heappush(self._heap, item)
+            self._cond.notify()
+
+        def on_done(f: Future):
+            # 排队中被取消的请求立即移出队列，不再占用队列深度
+            if f.cancelled():
+                self._remove(item)
+
+        future.add_done_callback(on_done)
+        return future
+
+    def _remove(self, item):
+        """将请求移出队列（已被工作线程取出时忽略）"""
+        with self._cond:
+            for i, queued in enumerate(self._heap):
+                if queued is item:
+                    self._heap[i] = self._heap[-1]
+                    self._heap.pop()
+                    heapq.heapify(self._heap)
+                    return
+
+    def _run(self):
+        """工作线程：按优先级依次执行"""
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                _, _, deadline, future, fn, args = heapq.heappop(self._heap)
+                self._running = True
+
+            try:
+                # 已取消的请求直接丢弃
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and time.monotonic() > deadline:
+                    FETCH_REJECTIONS.inc(reason="expired")
+                    future.set_exception(ServiceOverloadedError("请求在MT5获取队列中等待超时"))
+                    continue
+
+                start = time.monotonic()
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    duration = time.monotonic() - start
+                    with self._cond:
+                        self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+            finally:
+                with self._cond:
+                    self._running = False
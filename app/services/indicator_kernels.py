@@ -0,0 +1,304 @@
+"""技术指标向量化计算内核
+
+所有函数沿第0维（时间轴）计算，输入可以是一维数组 (T,)
+或按品种对齐的二维数组 (T, S)。缺失值与预热期输出均为NaN。
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+def rolling_sum(x: np.ndarray, period: int) -> np.ndarray:
+    """滚动求和，窗口内存在NaN时结果为NaN"""
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    if period <= 0 or x.shape[0] < period:
+        return out
+
+    nan_mask = np.isnan(x)
+    zero = np.zeros((1,) + x.shape[1:])
+    csum = np.concatenate([zero, np.cumsum(np.where(nan_mask, 0.0, x), axis=0)])
+    cnan = np.concatenate([zero, np.cumsum(nan_mask, axis=0)])
+    window_sum = csum[period:] - csum[:-period]
+    window_nan = cnan[period:] - cnan[:-period]
+    out[period - 1:] = np.where(window_nan > 0, np.nan, window_sum)
+    return out
+
+def rolling_mean(x: np.ndarray, period: int) -> np.ndarray:
+    """滚动均值"""
+    return rolling_sum(x, period) / period
+
+def _window_has_nan(x: np.ndarray, period: int) -> np.ndarray:
+    """各完整窗口内是否存在NaN（与x等长，前period-1行为True）"""
+    nan_count = np.concatenate([np.zeros((1,) + x.shape[1:]), np.cumsum(np.isnan(x), axis=0)])
+    out = np.ones(x.shape, dtype=bool)
+    out[period - 1:] = (nan_count[period:] - nan_count[:-period]) > 0
+    return out
+
+def _sliding_extreme(x: np.ndarray, period: int, ufunc, fill: float) -> np.ndarray:
+    """van Herk/Gil-Werman滑动极值：按窗口长度分块，块内前缀与后缀累积极值各算一次，O(T)
+
+    窗口 [t-period+1, t] 的极值为起点所在块的后缀极值与终点所在块的前缀极值之较。
+    """
+    length = x.shape[0]
+    out = np.full(x.shape, np.nan)
+    if period <= 0 or length < period:
+        return out
+
+    pad = (-length) % period
+    padded = np.concatenate([x, np.full((pad,) + x.shape[1:], fill)])
+    blocks = padded.reshape((-1, period) + x.shape[1:])
+    prefix = ufunc.accumulate(blocks, axis=1).reshape(padded.shape)
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+    out[period - 1:] = ufunc(suffix[:length - period + 1], prefix[period - 1:length])
+    return out
+
+def rolling_max(x: np.ndarray, period: int) -> np.ndarray:
+    """滚动最大值，窗口内存在NaN时结果为NaN"""
+    x = np.asarray(x, dtype=float)
+    out = _sliding_extreme(np.where(np.isnan(x), -np.inf, x), period, np.maximum, -np.inf)
+    out[_window_has_nan(x, period)] = np.nan
+    return out
+
+def rolling_min(x: np.ndarray, period: int) -> np.ndarray:
+    """滚动最小值，窗口内存在NaN时结果为NaN"""
+    x = np.asarray(x, dtype=float)
+    out = _sliding_extreme(np.where(np.isnan(x), np.inf, x), period, np.minimum, np.inf)
+    out[_window_has_nan(x, period)] = np.nan
+    return out
+
+def _sliding_argmax(x: np.ndarray, period: int) -> np.ndarray:
+    """滑动最大值所在的位置（并列时取最近一次），返回窗口 [t-period+1, t] 对应的 T-period+1 行，O(T)
+
+    与_sliding_extreme相同的分块方式：前缀部分记录块内截至当前的最大值最近一次出现的位置；
+    后缀部分取自当前起首个大于其后全部值的位置，即后缀最大值最近一次出现的位置。
+    两部分最大值相等时取前缀部分（时间上更近）。
+    """
+    length = x.shape[0]
+    pad = (-length) % period
+    padded = np.concatenate([x, np.full((pad,) + x.shape[1:], -np.inf)])
+    blocks = padded.reshape((-1, period) + x.shape[1:])
+    positions = np.broadcast_to(
+        np.arange(len(padded)).reshape((-1, period) + (1,) * (x.ndim - 1)), blocks.shape
+    )
+
+    prefix = np.maximum.accumulate(blocks, axis=1)
+    prefix_pos = np.maximum.accumulate(np.where(blocks == prefix, positions, -1), axis=1)
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1]
+    later = np.concatenate([suffix[:, 1:], np.full_like(suffix[:, :1], -np.inf)], axis=1)
+    candidates = blocks > later
+    candidates[:, -1] = True
+    suffix_pos = np.minimum.accumulate(np.where(candidates, positions, len(padded))[:, ::-1], axis=1)[:, ::-1]
+
+    prefix, prefix_pos = prefix.reshape(padded.shape), prefix_pos.reshape(padded.shape)
+    suffix, suffix_pos = suffix.reshape(padded.shape), suffix_pos.reshape(padded.shape)
+    starts = slice(0, length - period + 1)
+    ends = slice(period - 1, length)
+    return np.where(prefix[ends] >= suffix[starts], prefix_pos[ends], suffix_pos[starts])
+
+def periods_since_extreme(x: np.ndarray, period: int, highest: bool = True) -> np.ndarray:
+    """窗口内最高（或最低）值距当前的K线数，并列时取最近一次；窗口内存在NaN时为NaN"""
+    x = np.asarray(x, dtype=float)
+    out = np.full(x.shape, np.nan)
+    length = x.shape[0]
+    if period <= 0 or length < period:
+        return out
+
+    key = np.where(np.isnan(x), -np.inf, x if highest else -x)
+    positions = np.arange(period - 1, length).reshape((-1,) + (1,) * (x.ndim - 1))
+    out[period - 1:] = positions - _sliding_argmax(key, period)
+    out[_window_has_nan(x, period)] = np.nan
+    return out
+
+def rolling_std(x: np.ndarray, period: int) -> np.ndarray:
+    """滚动总体标准差（与np.std一致，ddof=0）"""
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    if period <= 0 or x.shape[0] < period:
+        return out
+
+    windows = sliding_window_view(x, period, axis=0)
+    out[period - 1:] = windows.std(axis=-1)
+    return out
+
+# 递推滤波分块计算时 (1-alpha)^-k 的指数上限，保证中间量不溢出且精度损失可忽略
+_MAX_EXPONENT = 50.0
+
+def _linear_filter(x: np.ndarray, alpha: float, initial) -> np.ndarray:
+    """一阶递推滤波 y[t] = (1-alpha)*y[t-1] + alpha*x[t]，y[-1] = initial，对全部列同时计算
+
+    x中的NaN表示跳过该步：输出NaN，递推状态保持不变。按块展开为
+    y[t] = a^k[t] * (y0 + alpha * cumsum(x[j] * a^-k[j]))，k[t]为块内截至t的有效步数，
+    每块内对 (T, S) 全部列完全向量化，Python循环次数为 T / 块长度。
+    """
+    decay = 1.0 - alpha
+    if decay <= 0:
+        return x.copy()
+
+    valid = ~np.isnan(x)
+    out = np.empty_like(x)
+    block = max(1, int(_MAX_EXPONENT / -np.log(decay)))
+    state = np.asarray(initial, dtype=float)
+    for start in range(0, len(x), block):
+        chunk = x[start:start + block]
+        mask = valid[start:start + block]
+        powers = decay ** np.cumsum(mask, axis=0)
+        values = powers * (state + alpha * np.cumsum(np.where(mask, chunk, 0.0) / powers, axis=0))
+        out[start:start + len(chunk)] = np.where(mask, values, np.nan)
+        state = values[-1]
+    return out
+
+def recursive_smooth(x: np.ndarray, period: int, alpha: float) -> np.ndarray:
+    """以首个完整窗口的SMA为初值的一阶递推平滑，(T, S) 全部列同时计算
+
+    初值之前输出NaN；初值之后缺失值处输出NaN，递推状态保持不变。
+    """
+    x = np.asarray(x, dtype=float)
+    if x.shape[0] == 0:
+        return x.copy()
+    seed = rolling_mean(x, period)
+    # 各列首个完整窗口的位置与初值，没有完整窗口的列初值为NaN，整列输出NaN
+    first = np.argmax(~np.isnan(seed), axis=0)
+    initial = np.take_along_axis(seed, first[np.newaxis], axis=0)[0]
+    rows = np.arange(x.shape[0]).reshape((-1,) + (1,) * (x.ndim - 1))
+    out = _linear_filter(np.where(rows > first, x, np.nan), alpha, initial)
+    return np.where(rows == first, initial, out)
+
+def ema(x: np.ndarray, period: int) -> np.ndarray:
+    """指数移动平均，以首个完整窗口的SMA作为初值，缺失值处输出NaN"""
+    return recursive_smooth(x, period, 2 / (period + 1))
+
+def wilder(x: np.ndarray, period: int) -> np.ndarray:
+    """Wilder平滑（alpha=1/period的指数平均），以首个完整窗口的SMA作为初值"""
+    return recursive_smooth(x, period, 1 / period)
+
+def _average(x: np.ndarray, period: int, smoothing: str) -> np.ndarray:
+    """按平滑方式求均值：sma为简单滚动平均，wilder为Wilder平滑"""
+    if smoothing == "wilder":
+        return wilder(x, period)
+    return rolling_mean(x, period)
+
+def macd(close: np.ndarray, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9):
+    """MACD，返回 (macd, macds, macdh)"""
+    macd_line = ema(close, fast_period) - ema(close, slow_period)
+    signal_line = ema(macd_line, signal_period)
+    return macd_line, signal_line, macd_line - signal_line
+
+def bollinger_bands(close: np.ndarray, period: int = 20, std_dev: float = 2):
+    """布林带，返回 (中轨, 上轨, 下轨)"""
+    middle = rolling_mean(close, period)
+    std = rolling_std(close, period)
+    return middle, middle + std_dev * std, middle - std_dev * std
+
+def _diff(x: np.ndarray) -> np.ndarray:
+    """一阶差分，首行为NaN"""
+    x = np.asarray(x, dtype=float)
+    out = np.full_like(x, np.nan)
+    out[1:] = x[1:] - x[:-1]
+    return out
+
+def rsi(close: np.ndarray, period: int = 14, smoothing: str = "sma") -> np.ndarray:
+    """相对强弱指数，smoothing为sma（涨跌幅简单平均）或wilder（Wilder平滑）"""
+    change = _diff(close)
+    gains = np.where(change > 0, change, 0.0)
+    losses = np.where(change < 0, -change, 0.0)
+    gains[np.isnan(change)] = np.nan
+    losses[np.isnan(change)] = np.nan
+
+    avg_gain = _average(gains, period, smoothing)
+    avg_loss = _average(losses, period, smoothing)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, 100.0, values)
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """真实波幅，首行为最高价减最低价"""
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    prev_close = np.full_like(high, np.nan)
+    prev_close[1:] = np.asarray(close, dtype=float)[:-1]
+
+    # 前收盘价缺失时fmax退化为最高价减最低价
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14, smoothing: str = "sma") -> np.ndarray:
+    """平均真实波幅，smoothing为sma（含首行的简单平均）或wilder（自第二行起的Wilder平滑）"""
+    tr = true_range(high, low, close)
+    if smoothing == "wilder":
+        # 首行没有前收盘价，Wilder平滑从第一根完整真实波幅开始
+        tr[0] = np.nan
+    out = _average(tr, period, smoothing)
+    if out.shape[0] < period + 1:
+        out[:] = np.nan
+    return out
+
+def vwma(close: np.ndarray, volume: np.ndarray, period: int = 20) -> np.ndarray:
+    """成交量加权移动平均"""
+    close = np.asarray(close, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+    pv_sum = rolling_sum(close * volume, period)
+    v_sum = rolling_sum(volume, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(v_sum > 0, pv_sum / v_sum, np.nan)
+
+def mfi(
+    high: np.ndarray, 
+    low: np.ndarray, 
+    close: np.ndarray, 
+    volume: np.ndarray, 
+    period: int = 14, 
+    smoothing: str = "sma"
+) -> np.ndarray:
+    """资金流量指数，smoothing为sma（窗口内资金流求和）或wilder（资金流Wilder平滑）"""
+    typical = (np.asarray(high, dtype=float) + np.asarray(low, dtype=float) + np.asarray(close, dtype=float)) / 3
+    raw_flow = typical * np.asarray(volume, dtype=float)
+    change = _diff(typical)
+
+    positive = np.where(change > 0, raw_flow, 0.0)
+    negative = np.where(change > 0, 0.0, raw_flow)
+    positive[0] = 0.0
+    negative[0] = 0.0
+    positive[np.isnan(raw_flow)] = np.nan
+    negative[np.isnan(raw_flow)] = np.nan
+
+    if smoothing == "wilder":
+        # 比值与求和方式一致，平滑首行（无涨跌方向）之后的资金流
+        positive[0] = np.nan
+        negative[0] = np.nan
+        positive_flow = wilder(positive, period)
+        negative_flow = wilder(negative, period)
+    else:
+        positive_flow = rolling_sum(positive, period)
+        negative_flow = rolling_sum(negative, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100 - 100 / (1 + positive_flow / negative_flow)
+    values = np.where(negative_flow == 0, 100.0, values)
+    values[:period] = np.nan
+    return values
+
+def donchian(high: np.ndarray, low: np.ndarray, period: int = 20):
+    """唐奇安通道，返回 (中轨, 上轨, 下轨)"""
+    upper = rolling_max(high, period)
+    lower = rolling_min(low, period)
+    return (upper + lower) / 2, upper, lower
+
+def stochastic(high: np.ndarray, low: np.ndarray, close: np.ndarray, k_period: int = 14, d_period: int = 3):
+    """随机指标，返回 (%K, %D)；窗口内最高价等于最低价时%K取50"""
+    highest = rolling_max(high, k_period)
+    lowest = rolling_min(low, k_period)
+    span = highest - lowest
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = np.where(span == 0, 50.0, 100 * (np.asarray(close, dtype=float) - lowest) / span)
+    return k, rolling_mean(k, d_period)
+
+def williams_r(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    """威廉指标（-100到0）；窗口内最高价等于最低价时取-50"""
+    highest = rolling_max(high, period)
+    lowest = rolling_min(low, period)
+    span = highest - lowest
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(span == 0, -50.0, -100 * (highest - np.asarray(close, dtype=float)) / span)
+
+def aroon(high: np.ndarray, low: np.ndarray, period: int = 25):
+    """阿隆指标（窗口含当前K线共period+1根），返回 (aroon_up, aroon_down, 震荡值)"""
+    up = 100 * (period - periods_since_extreme(high, period + 1, highest=True)) / period
+    down = 100 * (period - periods_since_extreme(low, period + 1, highest=False)) / period
+    return up, down, up - down
@@ -0,0 +1,148 @@
+"""技术指标注册表
+
+每个指标族声明输入字段、输出、参数、预热长度与计算内核，指标计算分发、数据量校验与
+/technical-indicators/supported 均由注册表生成。注册同名指标族会替换原有声明，可用于挂载更快的内核。
+"""
+from typing import Callable, Dict, List, Optional, Sequence, Union
+import numpy as np
+from app.services import indicator_kernels as kernels
+
+class IndicatorSpec:
+    """指标族声明
+
+    kernel按inputs顺序接收字段数组，再以关键字参数接收parameters（支持平滑方式时另传smoothing），
+    单输出时返回一个数组，多输出时返回与outputs顺序一致的元组。
+    """
+
+    __slots__ = ("name", "kernel", "inputs", "outputs", "parameters", "warmup", "category", "smoothing", "extra")
+
+    def __init__(
+        self,
+        name: str,
+        kernel: Callable,
+        inputs: Sequence[str],
+        outputs: Dict[str, str],
+        parameters: Dict,
+        warmup: Union[int, Dict[str, int]],
+        category: str,
+        smoothing: bool = False,
+        extra: Optional[Dict] = None
+    ):
+        self.name = name
+        self.kernel = kernel
+        self.inputs = tuple(inputs)
+        # 输出名称 -> 描述
+        self.outputs = dict(outputs)
+        self.parameters = dict(parameters)
+        # 各输出的预热长度（计算首个有效值所需的K线数量）
+        self.warmup = warmup if isinstance(warmup, dict) else {output: warmup for output in outputs}
+        self.category = category
+        # 是否支持sma/wilder平滑方式
+        self.smoothing = smoothing
+        # 仅用于展示的附加参数
+        self.extra = dict(extra or {})
+
+    def compute(self, fields: Dict[str, np.ndarray], smoothing: str = "sma") -> Dict[str, np.ndarray]:
+        """计算全部输出，返回 {输出名称: 数组}"""
+        kwargs = dict(self.parameters)
+        if self.smoothing:
+            kwargs["smoothing"] = smoothing
+        result = self.kernel(*(fields[field] for field in self.inputs), **kwargs)
+        if len(self.outputs) == 1:
+            result = (result,)
+        return dict(zip(self.outputs, result))
+
+class IndicatorRegistry:
+    """技术指标注册表，按输出名称O(1)查找所属指标族"""
+
+    def __init__(self):
+        self._specs: Dict[str, IndicatorSpec] = {}
+        # 输出名称 -> 所属指标族
+        self._outputs: Dict[str, IndicatorSpec] = {}
+
+    def register(self, spec: IndicatorSpec):
+        """注册指标族，同名指标族被替换"""
+        previous = self._specs.get(spec.name)
+        if previous is not None:
+            for output in previous.outputs:
+                self._outputs.pop(output, None)
+        self._specs[spec.name] = spec
+        for output in spec.outputs:
+            self._outputs[output] = spec
+
+    def get(self, name: str) -> Optional[IndicatorSpec]:
+        """按输出名称查找所属指标族"""
+        return self._outputs.get(name)
+
+    def get_family(self, name: str) -> Optional[IndicatorSpec]:
+        """按指标族名称或输出名称查找指标族"""
+        return self._specs.get(name) or self._outputs.get(name)
+
+    def warmup(self, name: str) -> int:
+        """指标的预热长度，不支持的指标返回0"""
+        spec = self._outputs.get(name)
+        return spec.warmup[name] if spec is not None else 0
+
+    def compute(self, name: str, fields: Dict[str, np.ndarray], smoothing: str = "sma") -> np.ndarray:
+        """计算单个指标输出"""
+        spec = self._outputs.get(name)
+        if spec is None:
+            raise ValueError(f"不支持的指标: {name}")
+        return spec.compute(fields, smoothing)[name]
+
+    def describe(self) -> List[Dict]:
+        """按注册顺序列出全部指标输出的描述信息"""
+        return [
+            {
+                "name": output,
+                "description": description,
+                "category": spec.category,
+                "parameters": {**spec.parameters, **spec.extra},
+                "group": spec.name
+            }
+            for spec in self._specs.values()
+            for output, description in spec.outputs.items()
+        ]
+
+def _sma(close: np.ndarray, period: int) -> np.ndarray:
+    """收盘价简单移动平均"""
+    return kernels.rolling_mean(close, period)
+
+# 全局指标注册表
+indicator_registry = IndicatorRegistry()
+
+for _spec in (
+    IndicatorSpec("close_50_sma", _sma, ("close",), {"close_50_sma": "50日简单移动平均线"},
+                  {"period": 50}, 50, "moving_averages", extra={"type": "sma"}),
+    IndicatorSpec("close_200_sma", _sma, ("close",), {"close_200_sma": "200日简单移动平均线"},
+                  {"period": 200}, 200, "moving_averages", extra={"type": "sma"}),
+    IndicatorSpec("close_10_ema", kernels.ema, ("close",), {"close_10_ema": "10日指数移动平均线"},
+                  {"period": 10}, 10, "moving_averages", extra={"type": "ema"}),
+    IndicatorSpec("macd", kernels.macd, ("close",),
+                  {"macd": "MACD主线", "macds": "MACD信号线", "macdh": "MACD柱状图"},
+                  {"fast_period": 12, "slow_period": 26, "signal_period": 9}, 26, "macd_indicators"),
+    IndicatorSpec("rsi", kernels.rsi, ("close",), {"rsi": "相对强弱指数"},
+                  {"period": 14}, 14, "momentum_indicators", smoothing=True),
+    IndicatorSpec("boll", kernels.bollinger_bands, ("close",),
+                  {"boll": "布林带中轨", "boll_ub": "布林带上轨", "boll_lb": "布林带下轨"},
+                  {"period": 20, "std_dev": 2}, 20, "volatility_indicators"),
+    IndicatorSpec("atr", kernels.atr, ("high", "low", "close"), {"atr": "平均真实波幅"},
+                  {"period": 14}, 14, "volatility_indicators", smoothing=True),
+    IndicatorSpec("vwma", kernels.vwma, ("close", "tick_volume"), {"vwma": "成交量加权移动平均线"},
+                  {"period": 20}, 20, "volume_indicators"),
+    IndicatorSpec("mfi", kernels.mfi, ("high", "low", "close", "tick_volume"), {"mfi": "资金流量指数"},
+                  {"period": 14}, 14, "volume_indicators", smoothing=True),
+    IndicatorSpec("donchian", kernels.donchian, ("high", "low"),
+                  {"donchian": "唐奇安通道中轨", "donchian_ub": "唐奇安通道上轨（最高价滚动最大值）",
+                   "donchian_lb": "唐奇安通道下轨（最低价滚动最小值）"},
+                  {"period": 20}, 20, "channel_indicators"),
+    IndicatorSpec("stoch", kernels.stochastic, ("high", "low", "close"),
+                  {"stoch_k": "随机指标%K", "stoch_d": "随机指标%D（%K的3周期均值）"},
+                  {"k_period": 14, "d_period": 3}, {"stoch_k": 14, "stoch_d": 16}, "momentum_indicators"),
+    IndicatorSpec("wr", kernels.williams_r, ("high", "low", "close"), {"wr": "威廉指标%R"},
+                  {"period": 14}, 14, "momentum_indicators"),
+    IndicatorSpec("aroon", kernels.aroon, ("high", "low"),
+                  {"aroon_up": "阿隆上升线", "aroon_down": "阿隆下降线", "aroonosc": "阿隆震荡指标（上升线减下降线）"},
+                  {"period": 25}, 26, "trend_indicators"),
+):
+    indicator_registry.register(_spec)
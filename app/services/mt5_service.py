@@ -1,64 +1,284 @@
+import asyncio
+import contextvars
+import threading
+import time
 import MetaTrader5 as mt5
-import pandas as pd
+import numpy as np
+from concurrent.futures import Future
 from datetime import datetime, timezone, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from app.config import settings
 from app.exceptions import MT5ConnectionError, DataRetrievalError, InvalidSymbolError, InvalidTimeframeError
-from app.utils import to_mt5_time, format_mt5_time_to_beijing
+from app.metrics import observe_stage, current_timeframe, MT5_RECONNECTS
+from app.services.bar_cache import BarCache, BarCacheEntry
+from app.services.bar_store import SharedBarStore
+from app.services.bar_owner import BarOwnerClient
+from app.services.mt5_terminal import (
+    connect_terminal, terminal_connected, get_timeframe_enum, copy_rates, copy_ticks, get_symbol_infos
+)
+from app.services.terminal_pool import TerminalPool
+from app.services.symbol_catalog import SymbolCatalog
+from app.services.fetch_queue import FetchQueue, request_deadline, PRIORITY_LIVE, PRIORITY_HISTORICAL
+from app.services.resampler import parse_timeframe, check_resample, resample_rates
+from app.utils import to_mt5_time, format_mt5_epochs_to_beijing, is_closed_range
+
+# 行情数据字段（按输出顺序）
+MARKET_DATA_FIELDS = ("time", "open", "high", "low", "close", "tick_volume", "spread", "real_volume")
+PRICE_FIELDS = ("open", "high", "low", "close")
 
 class MT5Service:
-    """MT5服务类"""
+    """MT5服务类
+    
+    local模式下由本进程直接访问MT5终端（配置MT5_TERMINAL_PATHS时改由终端进程池访问）；
+    shared模式下（多worker部署）不连接终端，K线从共享K线存储读取，未命中时请求MT5属主进程获取。
+    """
     
-    def __init__(self):
+    def __init__(self, mode: Optional[str] = None):
+        self.mode = mode or settings.mt5_mode
         self.connected = False
+        self.bar_cache = BarCache(settings.bar_cache_max_entries, settings.bar_cache_ttl)
+        # 正在排队或执行中的请求，相同区间的并发请求共享同一次终端调用
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        # 各进行中请求的等待方数量，全部离开时撤销排队中的终端调用
+        self._waiters: Dict[Tuple, int] = {}
+        self.fetch_queue = None
+        self.terminal_pool = None
+        self.bar_store = None
+        self.owner = None
+        # 交易品种目录，取代每次请求的symbol_info校验
+        self.symbols = SymbolCatalog(self.load_symbol_infos, settings.symbol_catalog_ttl)
+        
+        if self.mode == "shared":
+            self.bar_store = SharedBarStore(settings.bar_store_dir, settings.bar_cache_ttl, settings.bar_store_max_bytes)
+            self.owner = BarOwnerClient(
+                (settings.bar_owner_host, settings.bar_owner_port), settings.bar_owner_authkey.encode()
+            )
+            self.symbols.refresh_async()
+            return
+        
+        if settings.mt5_terminal_paths:
+            # 进程池模式：每个子进程连接一个独立安装路径的终端
+            self.terminal_pool = TerminalPool(settings.mt5_terminal_paths, settings.fetch_queue_max_depth)
+            self.symbols.refresh_async()
+            return
+        
+        # MT5终端不支持并发调用，所有终端请求通过单线程优先级队列串行执行
+        self.fetch_queue = FetchQueue(settings.fetch_queue_max_depth)
         # 初始化时不强制连接，允许服务启动
         try:
             self._connect()
         except Exception:
             # 连接失败不影响服务启动
             pass
+        self.symbols.refresh_async()
     
     def _connect(self) -> bool:
         """连接MT5"""
         try:
-            # 初始化MT5
-            if not mt5.initialize():
-                raise MT5ConnectionError("MT5初始化失败")
-            
-            # 登录MT5
-            if not mt5.login(
-                login=settings.mt5_login,
-                password=settings.mt5_password,
-                server=settings.mt5_server,
-                timeout=settings.mt5_timeout
-            ):
-                raise MT5ConnectionError("MT5登录失败")
-            
-            self.connected = True
-            return True
-            
-        except Exception as e:
+            connect_terminal()
+        except MT5ConnectionError:
             self.connected = False
-            raise MT5ConnectionError(f"MT5连接失败: {str(e)}")
+            raise
+        self.connected = True
+        return True
     
     def _get_timeframe_enum(self, timeframe: str) -> int:
         """将时间周期字符串转换为MT5枚举值"""
-        timeframe_map = {
-            "M1": mt5.TIMEFRAME_M1,
-            "M5": mt5.TIMEFRAME_M5,
-            "M15": mt5.TIMEFRAME_M15,
-            "M30": mt5.TIMEFRAME_M30,
-            "H1": mt5.TIMEFRAME_H1,
-            "H4": mt5.TIMEFRAME_H4,
-            "D1": mt5.TIMEFRAME_D1,
-            "W1": mt5.TIMEFRAME_W1,
-            "MN1": mt5.TIMEFRAME_MN1
-        }
-        
-        if timeframe not in timeframe_map:
-            raise InvalidTimeframeError(f"不支持的时间周期: {timeframe}")
-        
-        return timeframe_map[timeframe]
+        return get_timeframe_enum(timeframe)
+    
+    def _cache_key(self, symbol: str, timeframe: str, start_time: datetime, end_time: datetime) -> Tuple:
+        """生成K线缓存键"""
+        return (symbol, timeframe, to_mt5_time(start_time), to_mt5_time(end_time))
+    
+    def is_cached(self, symbol: str, timeframe: str, start_time: datetime, end_time: datetime) -> bool:
+        """K线区间是否已在进程内缓存或共享K线存储中（不计入命中统计）"""
+        key = self._cache_key(symbol, timeframe, start_time, end_time)
+        return self.bar_cache.contains(key) or (self.bar_store is not None and self.bar_store.contains(key))
+    
+    def _fetch_rates(self, symbol: str, timeframe: str, mt5_start_time: datetime, mt5_end_time: datetime) -> np.ndarray:
+        """从MT5终端获取原始K线数组（在获取队列线程中执行）"""
+        # 检查连接状态
+        if not self.connected:
+            MT5_RECONNECTS.inc()
+            self._connect()
+        
+        return copy_rates(symbol, timeframe, mt5_start_time, mt5_end_time)
+    
+    def submit_fetch(
+        self, 
+        symbol: str, 
+        timeframe: str, 
+        mt5_start_time: datetime, 
+        mt5_end_time: datetime, 
+        priority: int, 
+        deadline: Optional[float] = None, 
+        context: Optional[contextvars.Context] = None
+    ) -> Future:
+        """提交终端获取请求（本进程获取队列或终端进程池），返回concurrent.futures.Future"""
+        if self.terminal_pool is not None:
+            return self.terminal_pool.submit(
+                symbol, timeframe, mt5_start_time, mt5_end_time, priority, deadline, context
+            )
+        
+        args = (self._fetch_rates, symbol, timeframe, mt5_start_time, mt5_end_time)
+        if context is not None:
+            args = (context.run,) + args
+        return self.fetch_queue.submit(*args, priority=priority, deadline=deadline)
+    
+    def _fetch_ticks(self, symbol: str, mt5_start_time: datetime, mt5_end_time: datetime, flags: str) -> np.ndarray:
+        """从MT5终端获取原始逐笔报价数组（在获取队列线程中执行）"""
+        if not self.connected:
+            MT5_RECONNECTS.inc()
+            self._connect()
+        
+        return copy_ticks(symbol, mt5_start_time, mt5_end_time, flags)
+    
+    def submit_ticks(
+        self, 
+        symbol: str, 
+        mt5_start_time: datetime, 
+        mt5_end_time: datetime, 
+        flags: str, 
+        priority: int, 
+        deadline: Optional[float] = None
+    ) -> Future:
+        """提交逐笔报价获取请求（本进程获取队列或终端进程池），返回concurrent.futures.Future"""
+        if self.terminal_pool is not None:
+            return self.terminal_pool.submit_ticks(symbol, mt5_start_time, mt5_end_time, flags, priority, deadline)
+        
+        return self.fetch_queue.submit(
+            self._fetch_ticks, symbol, mt5_start_time, mt5_end_time, flags, priority=priority, deadline=deadline
+        )
+    
+    def _build_columns(self, rates: np.ndarray, fields: Optional[List[str]]) -> Dict[str, list]:
+        """按列生成请求的字段"""
+        fields = fields or MARKET_DATA_FIELDS
+        if len(rates) == 0:
+            return {field: [] for field in fields}
+        
+        columns = {}
+        for field in fields:
+            if field == "time":
+                # MT5返回的是UTC时间戳，转换为北京时间（加5小时）
+                columns[field] = format_mt5_epochs_to_beijing(rates['time'])
+            elif field in PRICE_FIELDS:
+                columns[field] = rates[field].astype(float).tolist()
+            else:
+                columns[field] = rates[field].astype(np.int64).tolist()
+        
+        return columns
+    
+    def rates_to_columns(self, rates: np.ndarray, fields: Optional[List[str]] = None) -> Dict[str, list]:
+        """将MT5原始K线数组按列转换，只生成请求的字段"""
+        with observe_stage("convert"):
+            return self._build_columns(rates, fields)
+    
+    def rates_to_records(self, rates: np.ndarray, fields: Optional[List[str]] = None) -> List[Dict]:
+        """将MT5原始K线数组转换为字典列表，只包含请求的字段"""
+        with observe_stage("convert"):
+            columns = self._build_columns(rates, fields)
+            names = list(columns)
+            return [dict(zip(names, row)) for row in zip(*columns.values())]
+    
+    def get_rates(self, symbol: str, timeframe: str, start_time: datetime, end_time: datetime) -> np.ndarray:
+        """获取原始K线数组（优先读取缓存，同步调用）"""
+        self.symbols.validate(symbol)
+        key = self._cache_key(symbol, timeframe, start_time, end_time)
+        entry = self.bar_cache.get(key)
+        if entry is not None:
+            return entry.rates
+        
+        closed = is_closed_range(end_time, timeframe)
+        priority = PRIORITY_HISTORICAL if closed else PRIORITY_LIVE
+        if self.owner is not None:
+            return self._load_shared_entry(key, symbol, timeframe, closed, priority, None).rates
+        
+        rates = self.submit_fetch(symbol, timeframe, key[2], key[3], priority).result()
+        self.bar_cache.put(key, rates, closed)
+        return rates
+    
+    async def fetch_entry(self, symbol: str, timeframe: str, start_time: datetime, end_time: datetime) -> BarCacheEntry:
+        """获取K线缓存条目（优先读取缓存，未命中时经获取队列访问MT5终端）"""
+        current_timeframe.set(timeframe)
+        self.symbols.validate(symbol)
+        key = self._cache_key(symbol, timeframe, start_time, end_time)
+        entry = self.bar_cache.get(key)
+        if entry is not None:
+            return entry
+        
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load_entry(key, symbol, timeframe, end_time))
+            self._inflight[key] = future
+            
+            def on_done(f: asyncio.Future):
+                self._inflight.pop(key, None)
+                # 标记异常已读取，避免所有等待方都已离开时产生告警
+                if not f.cancelled():
+                    f.exception()
+            
+            future.add_done_callback(on_done)
+        
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # 最后一个等待方被取消（如客户端断开）时，从获取队列中撤销尚未执行的终端调用
+            if self._waiters.get(key) == 1 and not future.done():
+                future.cancel()
+            raise
+        finally:
+            remaining = self._waiters.pop(key, 1) - 1
+            if remaining > 0:
+                self._waiters[key] = remaining
+    
+    async def _load_entry(self, key: Tuple, symbol: str, timeframe: str, end_time: datetime) -> BarCacheEntry:
+        """经获取队列从MT5终端获取K线并写入缓存"""
+        closed = is_closed_range(end_time, timeframe)
+        # 包含未收盘K线的实时请求优先；超出请求截止时间仍无法开始的调用直接拒绝
+        priority = PRIORITY_HISTORICAL if closed else PRIORITY_LIVE
+        deadline = request_deadline.get()
+        if self.owner is not None:
+            timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self._load_shared_entry, key, symbol, timeframe, closed, priority, timeout
+            )
+        
+        # 在获取队列线程中沿用当前请求上下文（指标标签等）
+        context = contextvars.copy_context()
+        future = self.submit_fetch(symbol, timeframe, key[2], key[3], priority, deadline, context)
+        rates = await asyncio.wrap_future(future)
+        return self.bar_cache.put(key, rates, closed)
+    
+    def _load_shared_entry(
+        self, 
+        key: Tuple, 
+        symbol: str, 
+        timeframe: str, 
+        closed: bool, 
+        priority: int, 
+        timeout: Optional[float]
+    ) -> BarCacheEntry:
+        """从共享K线存储读取，未命中时请求属主进程获取（阻塞调用）"""
+        entry = self.bar_store.get(key)
+        if entry is None:
+            self.owner.fetch(symbol, timeframe, key[2], key[3], closed, priority, timeout)
+            entry = self.bar_store.get(key)
+            if entry is None:
+                raise DataRetrievalError("共享K线存储中未找到属主进程写入的数据")
+        
+        if not entry.closed:
+            return entry
+        # 已收盘区间同时放入进程内缓存，保留存储中的修改时间以保持各worker的Last-Modified一致
+        local = self.bar_cache.put(key, entry.rates, True)
+        local.modified_at = entry.modified_at
+        return local
+    
+    async def fetch_rates(self, symbol: str, timeframe: str, start_time: datetime, end_time: datetime) -> np.ndarray:
+        """获取原始K线数组（优先读取缓存，未命中时经获取队列访问MT5终端）"""
+        entry = await self.fetch_entry(symbol, timeframe, start_time, end_time)
+        return entry.rates
     
     def get_market_data(
         self, 
@@ -69,63 +289,111 @@ class MT5Service:
     ) -> List[Dict]:
         """获取行情数据"""
         try:
-            # 检查连接状态
-            if not self.connected:
-                self._connect()
+            rates = self.get_rates(symbol, timeframe, start_time, end_time)
+            return self.rates_to_records(rates)
             
-            # 验证交易品种
-            symbol_info = mt5.symbol_info(symbol)
-            if symbol_info is None:
-                raise InvalidSymbolError(f"无效的交易品种: {symbol}")
-            
-            # 获取时间周期枚举
-            tf_enum = self._get_timeframe_enum(timeframe)
-            
-            # 时区转换：将北京时间转换为UTC时间（特殊处理）
-            mt5_start_time = to_mt5_time(start_time)
-            mt5_end_time = to_mt5_time(end_time)
-            
-            # 获取历史数据
-            rates = mt5.copy_rates_range(symbol, tf_enum, mt5_start_time, mt5_end_time)
-            
-            if rates is None or len(rates) == 0:
-                return []
-            
-            # 转换为DataFrame
-            df = pd.DataFrame(rates)
-            # MT5返回的是UTC时间戳，转换为北京时间（加5小时）
-            df['time'] = pd.to_datetime(df['time'], unit='s', utc=True) + pd.Timedelta(hours=5)
-            
-            # 转换为字典列表
-            data = []
-            for _, row in df.iterrows():
-                data.append({
-                    "time": row['time'].strftime('%Y-%m-%dT%H:%M:%S'),
-                    "open": float(row['open']),
-                    "high": float(row['high']),
-                    "low": float(row['low']),
-                    "close": float(row['close']),
-                    "tick_volume": int(row['tick_volume']),
-                    "spread": int(row['spread']),
-                    "real_volume": int(row['real_volume'])
-                })
-            
-            return data
+        except (InvalidSymbolError, InvalidTimeframeError):
+            raise
+        except Exception as e:
+            raise DataRetrievalError(f"获取行情数据失败: {str(e)}")
+    
+    async def fetch_resampled_rates(
+        self, 
+        symbol: str, 
+        base_timeframe: str, 
+        timeframes: List[str], 
+        start_time: datetime, 
+        end_time: datetime
+    ) -> Dict[str, np.ndarray]:
+        """由同一段低周期K线合成多个目标周期的原始K线数组
+        
+        与MT5原生接口一致，只返回开盘时间落在 [start_time, end_time] 内的K线。
+        """
+        for timeframe in timeframes:
+            check_resample(base_timeframe, timeframe)
+        
+        # 基础区间向后延伸一个目标周期，保证末根目标K线完整
+        max_seconds = max(parse_timeframe(timeframe)[1] for timeframe in timeframes)
+        base_seconds = parse_timeframe(base_timeframe)[1]
+        base_end_time = end_time + timedelta(seconds=max_seconds - base_seconds)
+        rates = await self.fetch_rates(symbol, base_timeframe, start_time, base_end_time)
+        
+        mt5_start = int(to_mt5_time(start_time).timestamp())
+        mt5_end = int(to_mt5_time(end_time).timestamp())
+        result = {}
+        for timeframe in timeframes:
+            if len(rates) == 0:
+                result[timeframe] = rates
+                continue
+            bars = resample_rates(rates, timeframe)
+            result[timeframe] = bars[(bars['time'] >= mt5_start) & (bars['time'] <= mt5_end)]
+        return result
+    
+    async def fetch_resampled_market_data(
+        self, 
+        symbol: str, 
+        base_timeframe: str, 
+        timeframes: List[str], 
+        start_time: datetime, 
+        end_time: datetime
+    ) -> Dict[str, List[Dict]]:
+        """获取由低周期K线合成的多周期行情数据"""
+        try:
+            resampled = await self.fetch_resampled_rates(symbol, base_timeframe, timeframes, start_time, end_time)
+            return {timeframe: self.rates_to_records(rates) for timeframe, rates in resampled.items()}
             
         except (InvalidSymbolError, InvalidTimeframeError):
             raise
         except Exception as e:
             raise DataRetrievalError(f"获取行情数据失败: {str(e)}")
     
+    def load_symbol_infos(self) -> List[Dict]:
+        """从终端加载全部交易品种的元数据（阻塞调用，供交易品种目录刷新）"""
+        if self.owner is not None:
+            return self.owner.get_symbol_infos()
+        if self.terminal_pool is not None:
+            return self.terminal_pool.get_symbol_infos()
+        return self.fetch_queue.submit(self._load_symbol_infos, priority=PRIORITY_LIVE).result()
+    
+    def _load_symbol_infos(self) -> List[Dict]:
+        """在获取队列线程中读取交易品种元数据"""
+        if not self.connected:
+            MT5_RECONNECTS.inc()
+            self._connect()
+        return get_symbol_infos()
+    
     def is_connected(self) -> bool:
         """检查MT5连接状态"""
-        return self.connected and mt5.terminal_info() is not None
+        if self.owner is not None:
+            return self.owner.is_connected()
+        if self.terminal_pool is not None:
+            return self.terminal_pool.is_connected()
+        return self.connected and terminal_connected()
     
     def disconnect(self):
         """断开MT5连接"""
+        if self.owner is not None:
+            self.owner.close()
+            return
+        if self.terminal_pool is not None:
+            self.terminal_pool.close()
+            return
         if self.connected:
             mt5.shutdown()
             self.connected = False
 
-# 全局MT5服务实例
-mt5_service = MT5Service()
+# 全局MT5服务实例，首次访问 mt5_service 时按配置创建
+# 属主进程只导入MT5Service类并自建本地模式实例，不会创建指向自身的共享模式实例
+_mt5_service: Optional[MT5Service] = None
+_mt5_service_lock = threading.Lock()
+
+def __getattr__(name: str):
+    """延迟创建全局实例"""
+    global _mt5_service
+    if name != "mt5_service":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _mt5_service is None:
+        with _mt5_service_lock:
+            if _mt5_service is None:
+                _mt5_service = MT5Service()
+    return _mt5_service
@@ -0,0 +1,125 @@
+"""MT5终端调用
+
+MetaTrader5绑定每个进程只能连接一个终端。本模块封装连接、K线、逐笔报价与交易品种元数据的获取，
+供MT5Service（本进程终端）与终端工作进程（进程池模式）共用。
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+import MetaTrader5 as mt5
+import numpy as np
+from app.config import settings
+from app.exceptions import MT5ConnectionError, DataRetrievalError, InvalidSymbolError, InvalidTimeframeError
+from app.metrics import observe_stage, MT5_ERRORS
+
+def connect_terminal(path: Optional[str] = None):
+    """初始化并登录MT5终端，path为终端安装路径（为空时使用默认终端）"""
+    try:
+        # 初始化MT5
+        initialized = mt5.initialize(path=path) if path else mt5.initialize()
+        if not initialized:
+            raise MT5ConnectionError("MT5初始化失败")
+
+        # 登录MT5
+        if not mt5.login(
+            login=settings.mt5_login,
+            password=settings.mt5_password,
+            server=settings.mt5_server,
+            timeout=settings.mt5_timeout
+        ):
+            raise MT5ConnectionError("MT5登录失败")
+
+    except Exception as e:
+        MT5_ERRORS.inc(operation="connect")
+        raise MT5ConnectionError(f"MT5连接失败: {str(e)}")
+
+def terminal_connected() -> bool:
+    """终端是否处于连接状态"""
+    return mt5.terminal_info() is not None
+
+def get_timeframe_enum(timeframe: str) -> int:
+    """将时间周期字符串转换为MT5枚举值"""
+    timeframe_map = {
+        "M1": mt5.TIMEFRAME_M1,
+        "M5": mt5.TIMEFRAME_M5,
+        "M15": mt5.TIMEFRAME_M15,
+        "M30": mt5.TIMEFRAME_M30,
+        "H1": mt5.TIMEFRAME_H1,
+        "H4": mt5.TIMEFRAME_H4,
+        "D1": mt5.TIMEFRAME_D1,
+        "W1": mt5.TIMEFRAME_W1,
+        "MN1": mt5.TIMEFRAME_MN1
+    }
+
+    if timeframe not in timeframe_map:
+        raise InvalidTimeframeError(f"不支持的时间周期: {timeframe}")
+
+    return timeframe_map[timeframe]
+
+def check_symbol(symbol: str):
+    """经终端逐个校验交易品种是否存在"""
+    if mt5.symbol_info(symbol) is None:
+        raise InvalidSymbolError(f"无效的交易品种: {symbol}")
+
+def copy_rates(symbol: str, timeframe: str, mt5_start_time: datetime, mt5_end_time: datetime) -> np.ndarray:
+    """从当前终端获取原始K线数组
+
+    交易品种通常由调用方经品种目录校验；结果为空或获取失败时再经symbol_info校验一次，
+    品种目录未加载或刷新失败期间，拼写错误的品种返回无效品种错误，而不会被当作空区间缓存。
+    """
+    # 获取时间周期枚举
+    tf_enum = get_timeframe_enum(timeframe)
+
+    # 获取历史数据
+    with observe_stage("mt5_fetch", timeframe=timeframe):
+        rates = mt5.copy_rates_range(symbol, tf_enum, mt5_start_time, mt5_end_time)
+
+    if rates is None or len(rates) == 0:
+        check_symbol(symbol)
+    # 终端调用失败时抛出异常，不能当作空区间返回，否则已收盘区间会被永久缓存为空结果
+    if rates is None:
+        MT5_ERRORS.inc(operation="copy_rates_range")
+        raise DataRetrievalError(f"获取K线数据失败: {mt5.last_error()}")
+    return rates
+
+def get_tick_flags(flags: str) -> int:
+    """将逐笔报价类型字符串转换为MT5枚举值"""
+    flags_map = {
+        "all": mt5.COPY_TICKS_ALL,
+        "info": mt5.COPY_TICKS_INFO,
+        "trade": mt5.COPY_TICKS_TRADE
+    }
+    if flags not in flags_map:
+        raise DataRetrievalError(f"不支持的逐笔报价类型: {flags}")
+    return flags_map[flags]
+
+def copy_ticks(symbol: str, mt5_start_time: datetime, mt5_end_time: datetime, flags: str = "all") -> np.ndarray:
+    """从当前终端获取一段时间内的原始逐笔报价数组，结果为空或获取失败时经symbol_info校验交易品种"""
+    with observe_stage("mt5_fetch", timeframe="tick"):
+        ticks = mt5.copy_ticks_range(symbol, mt5_start_time, mt5_end_time, get_tick_flags(flags))
+
+    if ticks is None or len(ticks) == 0:
+        check_symbol(symbol)
+    if ticks is None:
+        MT5_ERRORS.inc(operation="copy_ticks_range")
+        raise DataRetrievalError(f"获取逐笔报价失败: {mt5.last_error()}")
+    return ticks
+
+def get_symbol_infos() -> List[Dict]:
+    """获取当前终端全部交易品种的元数据"""
+    symbols = mt5.symbols_get()
+    if symbols is None:
+        MT5_ERRORS.inc(operation="symbols_get")
+        raise DataRetrievalError("获取交易品种列表失败")
+    return [
+        {
+            "name": symbol.name,
+            "description": symbol.description,
+            "path": symbol.path,
+            "digits": symbol.digits,
+            "point": symbol.point,
+            "currency_base": symbol.currency_base,
+            "currency_profit": symbol.currency_profit,
+            "trade_contract_size": symbol.trade_contract_size
+        }
+        for symbol in symbols
+    ]
@@ -0,0 +1,82 @@
+import re
+import numpy as np
+from typing import Tuple
+from app.exceptions import InvalidTimeframeError
+from app.utils import TIMEFRAME_SECONDS
+
+# 周线起点偏移：1970-01-01为周四，MT5周线从周日开始
+_WEEK_OFFSET = 3 * 86400
+
+_TIMEFRAME_PATTERN = re.compile(r"^(M|H|D)(\d+)$")
+
+def parse_timeframe(timeframe: str) -> Tuple[str, int]:
+    """解析时间周期字符串，返回 (类型, 秒数)
+
+    支持 M<n>、H<n>、D<n> 形式的整数周期（如M2、H2、H12），
+    以及W1和MN1。MN1的秒数按31天计，仅用于估算区间。
+    """
+    if timeframe == "W1":
+        return "week", TIMEFRAME_SECONDS["W1"]
+    if timeframe == "MN1":
+        return "month", TIMEFRAME_SECONDS["MN1"]
+
+    match = _TIMEFRAME_PATTERN.match(timeframe or "")
+    if match is None or int(match.group(2)) <= 0:
+        raise InvalidTimeframeError(f"不支持的时间周期: {timeframe}")
+
+    unit, count = match.group(1), int(match.group(2))
+    seconds = {"M": 60, "H": 3600, "D": 86400}[unit] * count
+    # 日内周期需能整除一天，多日周期需为整数天，保证K线边界与交易日对齐
+    if (seconds < 86400 and 86400 % seconds != 0) or (seconds >= 86400 and seconds % 86400 != 0):
+        raise InvalidTimeframeError(f"不支持的时间周期: {timeframe}")
+    return "fixed", seconds
+
+def bucket_start_times(times: np.ndarray, timeframe: str) -> np.ndarray:
+    """计算每根K线所属目标周期K线的开盘时间"""
+    kind, seconds = parse_timeframe(timeframe)
+    times = np.asarray(times, dtype=np.int64)
+    if kind == "month":
+        months = times.astype("datetime64[s]").astype("datetime64[M]")
+        return months.astype("datetime64[s]").astype(np.int64)
+    if kind == "week":
+        return (times - _WEEK_OFFSET) // seconds * seconds + _WEEK_OFFSET
+    return times // seconds * seconds
+
+def check_resample(base_timeframe: str, timeframe: str):
+    """校验目标周期能否由基础周期合成"""
+    base_kind, base_seconds = parse_timeframe(base_timeframe)
+    kind, seconds = parse_timeframe(timeframe)
+    if base_kind != "fixed" or base_seconds > 86400:
+        raise InvalidTimeframeError(f"基础周期 {base_timeframe} 不能用于合成其他周期")
+    if kind == "fixed" and (seconds < base_seconds or seconds % base_seconds != 0):
+        raise InvalidTimeframeError(f"时间周期 {timeframe} 不是基础周期 {base_timeframe} 的整数倍")
+
+def aggregate_groups(rates: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """按分组起点下标将连续K线聚合，返回同结构的数组
+
+    开盘取首根、收盘取末根、最高/最低取极值、成交量求和、点差取最小值，时间取首根K线时间。
+    """
+    ends = np.r_[starts[1:], len(rates)] - 1
+
+    out = np.empty(len(starts), dtype=rates.dtype)
+    out['time'] = rates['time'][starts]
+    out['open'] = rates['open'][starts]
+    out['high'] = np.maximum.reduceat(rates['high'], starts)
+    out['low'] = np.minimum.reduceat(rates['low'], starts)
+    out['close'] = rates['close'][ends]
+    out['tick_volume'] = np.add.reduceat(rates['tick_volume'], starts)
+    out['spread'] = np.minimum.reduceat(rates['spread'], starts)
+    out['real_volume'] = np.add.reduceat(rates['real_volume'], starts)
+    return out
+
+def resample_rates(rates: np.ndarray, timeframe: str) -> np.ndarray:
+    """将低周期原始K线数组向量化聚合为目标周期，返回同结构的数组"""
+    if len(rates) == 0:
+        return rates
+
+    buckets = bucket_start_times(rates['time'], timeframe)
+    # 分组边界：时间桶发生变化的位置
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    out = aggregate_groups(rates, starts)
+    out['time'] = buckets[starts]
+    return out
@@ -0,0 +1,229 @@
+"""条件扫描
+
+将 "rsi(14) < 30 and close > sma(200)" 这类条件表达式解析为语法树（只允许白名单内的节点），
+在每个品种的K线数组上向量化求值，得到逐根K线的布尔结果。
+名称与函数不区分大小写；注册表中的指标输出名称（如 rsi、macdh、boll_ub）按默认参数计算。
+"""
+import ast
+from typing import Callable, Dict, Tuple
+import numpy as np
+from app.exceptions import InvalidConditionError
+from app.services import indicator_kernels as kernels
+from app.services.indicator_registry import indicator_registry
+
+# 表达式中可直接引用的K线字段
+FIELDS = {
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "close": "close",
+    "volume": "tick_volume",
+    "tick_volume": "tick_volume",
+    "real_volume": "real_volume",
+    "spread": "spread"
+}
+
+# 参数化函数允许的最大周期
+MAX_PERIOD = 5000
+
+_COMPARE = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal
+}
+
+_ARITHMETIC = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide
+}
+
+def _shift(x: np.ndarray, n: int) -> np.ndarray:
+    """向后平移n根K线，前n行为NaN"""
+    out = np.full_like(x, np.nan)
+    if n < len(x):
+        out[n:] = x[:len(x) - n]
+    return out
+
+def _cross(a: np.ndarray, b: np.ndarray, above: bool) -> np.ndarray:
+    """a在本根K线上穿（above）或下穿b"""
+    diff = a - b
+    previous = _shift(diff, 1)
+    if above:
+        return (diff > 0) & (previous <= 0)
+    return (diff < 0) & (previous >= 0)
+
+# 函数名 -> (计算函数, 周期参数后可选的序列参数默认字段)；计算函数接收 (字段字典, 平滑方式, 参数...)
+_FUNCTIONS: Dict[str, Tuple[Callable, str]] = {
+    "sma": (lambda f, s, period, x: kernels.rolling_mean(x, period), "close"),
+    "ema": (lambda f, s, period, x: kernels.ema(x, period), "close"),
+    "rsi": (lambda f, s, period, x: kernels.rsi(x, period, s), "close"),
+    "highest": (lambda f, s, period, x: kernels.rolling_max(x, period), "high"),
+    "lowest": (lambda f, s, period, x: kernels.rolling_min(x, period), "low"),
+    "atr": (lambda f, s, period: kernels.atr(f["high"], f["low"], f["close"], period, s), None),
+}
+
+class Condition:
+    """已解析的条件表达式"""
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise InvalidConditionError(f"条件表达式语法错误: {e.msg}")
+        self._tree = tree.body
+        # 表达式中的指标项数量，用于估算请求成本
+        self.indicator_count = 0
+        self._validate(self._tree)
+        self._require_boolean(self._tree)
+
+    @staticmethod
+    def _require_boolean(node: ast.AST):
+        """逻辑运算的操作数与整个表达式必须是比较、逻辑运算或穿越判断"""
+        if isinstance(node, ast.Compare):
+            return
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id.lower() in ("cross_above", "cross_below"):
+            return
+        if isinstance(node, (ast.BoolOp, ast.UnaryOp)) and isinstance(node.op, (ast.And, ast.Or, ast.Not)):
+            return
+        raise InvalidConditionError(f"条件必须是比较或逻辑运算: {ast.unparse(node)}")
+
+    def _validate(self, node: ast.AST):
+        """校验语法树只包含白名单节点"""
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._validate(value)
+                self._require_boolean(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            self._validate(node.operand)
+            self._require_boolean(node.operand)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            self._validate(node.operand)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _ARITHMETIC:
+            self._validate(node.left)
+            self._validate(node.right)
+        elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            for value in [node.left] + node.comparators:
+                self._validate(value)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            pass
+        elif isinstance(node, ast.Name):
+            name = node.id.lower()
+            if name not in FIELDS:
+                if indicator_registry.get(name) is None:
+                    raise InvalidConditionError(f"未知的字段或指标: {node.id}")
+                self.indicator_count += 1
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            self._validate_call(node)
+        else:
+            raise InvalidConditionError(f"条件表达式中不支持的语法: {ast.unparse(node)}")
+
+    def _validate_call(self, node: ast.Call):
+        """校验函数调用的名称与参数"""
+        name = node.func.id.lower()
+        args = node.args
+        if name in ("cross_above", "cross_below"):
+            if len(args) != 2:
+                raise InvalidConditionError(f"{name}需要2个参数")
+            for arg in args:
+                self._validate(arg)
+        elif name == "prev":
+            if len(args) not in (1, 2):
+                raise InvalidConditionError("prev需要1或2个参数")
+            self._validate(args[0])
+            if len(args) == 2:
+                self._period(name, args[1])
+        elif name in _FUNCTIONS:
+            series_default = _FUNCTIONS[name][1]
+            max_args = 1 if series_default is None else 2
+            if not 1 <= len(args) <= max_args:
+                raise InvalidConditionError(f"{name}需要{'1' if max_args == 1 else '1或2'}个参数")
+            self._period(name, args[0])
+            if len(args) == 2:
+                self._validate(args[1])
+            self.indicator_count += 1
+        else:
+            raise InvalidConditionError(f"未知的函数: {node.func.id}")
+
+    @staticmethod
+    def _period(name: str, node: ast.AST) -> int:
+        """校验周期参数为正整数常量"""
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, int) and not isinstance(node.value, bool)
+                and 0 < node.value <= MAX_PERIOD):
+            raise InvalidConditionError(f"{name}的周期必须是1到{MAX_PERIOD}之间的整数")
+        return node.value
+
+    def evaluate(self, rates: np.ndarray, smoothing: str = "sma") -> np.ndarray:
+        """在K线数组上求值，返回与K线等长的布尔数组（涉及NaN的比较为False）"""
+        fields = {field: rates[field].astype(float) for field in set(FIELDS.values())}
+        # 相同子表达式（如重复出现的 rsi(14)）只计算一次
+        memo: Dict[str, np.ndarray] = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = self._eval(self._tree, fields, smoothing, memo)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (len(rates),))
+
+    def _eval(self, node: ast.AST, fields: Dict[str, np.ndarray], smoothing: str, memo: Dict[str, np.ndarray]):
+        """递归求值"""
+        if isinstance(node, ast.Constant):
+            return float(node.value)
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self._eval(node.values[0], fields, smoothing, memo)
+            for value in node.values[1:]:
+                result = combine(result, self._eval(value, fields, smoothing, memo))
+            return result
+        if isinstance(node, ast.UnaryOp):
+            operand = self._eval(node.operand, fields, smoothing, memo)
+            if isinstance(node.op, ast.Not):
+                return np.logical_not(operand)
+            return -operand if isinstance(node.op, ast.USub) else operand
+        if isinstance(node, ast.BinOp):
+            return _ARITHMETIC[type(node.op)](
+                self._eval(node.left, fields, smoothing, memo), self._eval(node.right, fields, smoothing, memo)
+            )
+        if isinstance(node, ast.Compare):
+            # 链式比较 a < b < c 按 (a < b) and (b < c) 计算
+            left = self._eval(node.left, fields, smoothing, memo)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, fields, smoothing, memo)
+                result = np.logical_and(result, _COMPARE[type(op)](left, right))
+                left = right
+            return result
+
+        key = ast.dump(node).lower()
+        if key not in memo:
+            memo[key] = self._eval_term(node, fields, smoothing, memo)
+        return memo[key]
+
+    def _eval_term(self, node: ast.AST, fields: Dict[str, np.ndarray], smoothing: str, memo: Dict[str, np.ndarray]):
+        """计算字段、指标或函数项"""
+        if isinstance(node, ast.Name):
+            name = node.id.lower()
+            if name in FIELDS:
+                return fields[FIELDS[name]]
+            return indicator_registry.compute(name, fields, smoothing)
+
+        name = node.func.id.lower()
+        if name in ("cross_above", "cross_below"):
+            a, b = (np.broadcast_to(self._eval(arg, fields, smoothing, memo), fields["close"].shape) for arg in node.args)
+            return _cross(np.asarray(a, dtype=float), np.asarray(b, dtype=float), name == "cross_above")
+        if name == "prev":
+            series = np.broadcast_to(self._eval(node.args[0], fields, smoothing, memo), fields["close"].shape)
+            return _shift(np.asarray(series, dtype=float), node.args[1].value if len(node.args) == 2 else 1)
+
+        function, series_default = _FUNCTIONS[name]
+        period = node.args[0].value
+        if series_default is None:
+            return function(fields, smoothing, period)
+        if len(node.args) == 2:
+            series = self._eval(node.args[1], fields, smoothing, memo)
+            series = np.asarray(np.broadcast_to(series, fields["close"].shape), dtype=float)
+        else:
+            series = fields[series_default]
+        return function(fields, smoothing, period, series)
@@ -0,0 +1,186 @@
+"""流式与批量获取
+
+基于MT5Service的终端调用与K线缓存：按时间片流式获取逐笔报价、按完成顺序批量获取K线，
+以及由逐笔报价或M1 K线流式构建非时间K线。
+"""
+import asyncio
+import io
+import time
+import numpy as np
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple, AsyncIterator
+from fastapi import HTTPException
+from app.config import settings
+from app.metrics import observe_stage
+from app.services.fetch_queue import PRIORITY_LIVE, PRIORITY_HISTORICAL
+from app.services.custom_bars import BarBuilder, RATES_DTYPE, ticks_to_rows
+from app.utils import to_mt5_time, is_closed_range
+
+# 逐笔报价字段
+TICK_FIELDS = ("time_msc", "bid", "ask", "last", "volume", "volume_real", "flags")
+TICK_FLOAT_FIELDS = ("bid", "ask", "last", "volume_real")
+
+async def _load_tick_slice(
+    service,
+    symbol: str,
+    mt5_start_time: datetime,
+    mt5_end_time: datetime,
+    flags: str,
+    priority: int,
+    last: bool
+) -> np.ndarray:
+    """获取一个时间片的逐笔报价，只保留落在 [开始, 结束) 内的报价（最后一片包含结束时间）"""
+    # 流式响应可能远长于请求截止时间，每个时间片单独计算截止时间
+    timeout = settings.request_timeout
+    if service.owner is not None:
+        loop = asyncio.get_running_loop()
+        ticks = await loop.run_in_executor(
+            None, service.owner.fetch_ticks, symbol, mt5_start_time, mt5_end_time, flags, priority, timeout
+        )
+    else:
+        future = service.submit_ticks(
+            symbol, mt5_start_time, mt5_end_time, flags, priority, time.monotonic() + timeout
+        )
+        ticks = await asyncio.wrap_future(future)
+
+    if len(ticks) == 0:
+        return ticks
+    start_msc = int(mt5_start_time.timestamp() * 1000)
+    end_msc = int(mt5_end_time.timestamp() * 1000)
+    time_msc = ticks['time_msc']
+    mask = (time_msc >= start_msc) & ((time_msc <= end_msc) if last else (time_msc < end_msc))
+    return ticks[mask]
+
+async def iter_ticks(
+    service,
+    symbol: str,
+    start_time: datetime,
+    end_time: datetime,
+    flags: str = "all"
+) -> AsyncIterator[np.ndarray]:
+    """按时间片获取逐笔报价，逐片产出原始数组
+
+    每片时长为TICK_SLICE_SECONDS，内存占用与区间长度无关；产出当前片时下一片已在获取队列中排队。
+    """
+    service.symbols.validate(symbol)
+    mt5_start = to_mt5_time(start_time)
+    mt5_end = to_mt5_time(end_time)
+    priority = PRIORITY_HISTORICAL if is_closed_range(end_time, "tick") else PRIORITY_LIVE
+    step = timedelta(seconds=settings.tick_slice_seconds)
+
+    slices = []
+    cursor = mt5_start
+    while True:
+        slice_end = min(cursor + step, mt5_end)
+        slices.append((cursor, slice_end, slice_end >= mt5_end))
+        if slice_end >= mt5_end:
+            break
+        cursor = slice_end
+
+    def load(index: int) -> asyncio.Future:
+        slice_start, slice_end, last = slices[index]
+        return asyncio.ensure_future(
+            _load_tick_slice(service, symbol, slice_start, slice_end, flags, priority, last)
+        )
+
+    pending = load(0)
+    try:
+        for index in range(len(slices)):
+            ticks = await pending
+            pending = load(index + 1) if index + 1 < len(slices) else None
+            if len(ticks) > 0:
+                yield ticks
+    finally:
+        # 客户端断开或出错时撤销预取的时间片
+        if pending is not None:
+            pending.cancel()
+
+def ticks_to_columns(ticks: np.ndarray, fields: Optional[List[str]] = None) -> Dict[str, list]:
+    """将逐笔报价数组按列转换（每列一次tolist，不逐笔生成字典）"""
+    fields = fields or TICK_FIELDS
+    with observe_stage("convert", timeframe="tick"):
+        return {
+            field: ticks[field].astype(float if field in TICK_FLOAT_FIELDS else np.int64).tolist()
+            for field in fields
+        }
+
+def ticks_to_npy(ticks: np.ndarray, fields: Optional[List[str]] = None) -> bytes:
+    """将逐笔报价数组按请求的字段编码为.npy格式（紧凑结构化数组，可由numpy.load逐段读取）"""
+    fields = list(fields or TICK_FIELDS)
+    with observe_stage("serialize", timeframe="tick"):
+        dtype = np.dtype([(field, ticks.dtype[field]) for field in fields])
+        packed = np.empty(len(ticks), dtype=dtype)
+        for field in fields:
+            packed[field] = ticks[field]
+        buffer = io.BytesIO()
+        np.save(buffer, packed, allow_pickle=False)
+        return buffer.getvalue()
+
+async def fetch_custom_bars(
+    service,
+    symbol: str,
+    bar_type: str,
+    size: Optional[float],
+    start_time: datetime,
+    end_time: datetime,
+    source: str = "M1",
+    price: str = "bid",
+    timeframe: str = "H1",
+    smooth: bool = False
+) -> np.ndarray:
+    """构建非时间K线，返回与MT5原始K线同结构的数组
+
+    逐笔报价来源按时间片流式追加到构建器，内存占用只与生成的K线数量有关；
+    heikin_ashi类型基于timeframe周期的K线变换。
+    """
+    builder = BarBuilder(bar_type, size, smooth)
+    parts = []
+    if bar_type == "heikin_ashi":
+        parts.append(builder.extend(await service.fetch_rates(symbol, timeframe, start_time, end_time)))
+    elif source == "ticks":
+        async for ticks in iter_ticks(service, symbol, start_time, end_time):
+            with observe_stage("convert", timeframe="tick"):
+                parts.append(builder.extend(ticks_to_rows(ticks, price)))
+    else:
+        parts.append(builder.extend(await service.fetch_rates(symbol, "M1", start_time, end_time)))
+    parts.append(builder.flush())
+    return np.concatenate(parts) if parts else np.empty(0, dtype=RATES_DTYPE)
+
+async def iter_rates_batch(
+    service,
+    items: List[Tuple[str, str, datetime, datetime]]
+) -> AsyncIterator[Tuple[int, np.ndarray, Optional[str], bool]]:
+    """批量获取原始K线数组，按完成顺序产出 (序号, K线数组, 错误信息, 是否命中缓存)
+
+    缓存命中的条目最先返回，其余条目依次进入获取队列。
+    """
+    pending = []
+    for index, (symbol, timeframe, start_time, end_time) in enumerate(items):
+        try:
+            cached = service.is_cached(symbol, timeframe, start_time, end_time)
+        except Exception as e:
+            yield index, np.empty(0), f"获取行情数据失败: {str(e)}", False
+            continue
+        if cached:
+            rates = await service.fetch_rates(symbol, timeframe, start_time, end_time)
+            yield index, rates, None, True
+        else:
+            pending.append((index, symbol, timeframe, start_time, end_time))
+
+    async def run(index, symbol, timeframe, start_time, end_time):
+        try:
+            rates = await service.fetch_rates(symbol, timeframe, start_time, end_time)
+            return index, rates, None
+        except HTTPException as e:
+            return index, np.empty(0), e.detail
+        except Exception as e:
+            return index, np.empty(0), f"获取行情数据失败: {str(e)}"
+
+    tasks = [asyncio.ensure_future(run(*item)) for item in pending]
+    try:
+        for task in asyncio.as_completed(tasks):
+            index, rates, error = await task
+            yield index, rates, error, False
+    finally:
+        for task in tasks:
+            task.cancel()
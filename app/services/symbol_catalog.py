@@ -0,0 +1,142 @@
+import bisect
+import logging
+import threading
+import time
+from fnmatch import fnmatchcase
+from typing import Callable, Dict, List, Optional
+from app.exceptions import InvalidSymbolError
+from app.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# 交易品种元数据字段
+SYMBOL_FIELDS = (
+    "name", "description", "path", "digits", "point",
+    "currency_base", "currency_profit", "trade_contract_size"
+)
+
+class SymbolInfo:
+    """交易品种元数据"""
+
+    __slots__ = SYMBOL_FIELDS
+
+    def __init__(self, **fields):
+        for field in SYMBOL_FIELDS:
+            setattr(self, field, fields.get(field))
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return {field: getattr(self, field) for field in SYMBOL_FIELDS}
+
+def _is_prefix_pattern(pattern: str) -> bool:
+    """是否为仅以*结尾的前缀模式（如 EUR*），可走有序索引"""
+    body = pattern[:-1]
+    return pattern.endswith("*") and not any(c in body for c in "*?[")
+
+class SymbolCatalog:
+    """交易品种目录
+
+    缓存终端的交易品种列表及元数据，按TTL在后台刷新，过期期间继续返回旧数据。
+    按名称排序建立索引，支持MT5分组语法（逗号分隔，*通配，!排除）的查询，前缀模式走二分查找。
+    """
+
+    def __init__(self, loader: Callable[[], List[Dict]], ttl: float = 300.0, min_refresh_interval: float = 10.0):
+        self.loader = loader
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._symbols: Dict[str, SymbolInfo] = {}
+        self._names: List[str] = []
+        self._loaded_at: Optional[float] = None
+        self._attempted_at = 0.0
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        """是否已成功加载过"""
+        return self._loaded_at is not None
+
+    def refresh(self):
+        """从终端重新加载（阻塞调用）"""
+        infos = [SymbolInfo(**item) for item in self.loader()]
+        symbols = {info.name: info for info in infos}
+        with self._lock:
+            self._symbols = symbols
+            self._names = sorted(symbols)
+            self._loaded_at = time.monotonic()
+
+    def refresh_async(self, force: bool = False):
+        """在后台线程中刷新，同一时刻只有一个刷新；force为False时仅在过期后刷新"""
+        now = time.monotonic()
+        with self._lock:
+            if self._refreshing or now - self._attempted_at < self.min_refresh_interval:
+                return
+            if not force and self._loaded_at is not None and now - self._loaded_at < self.ttl:
+                return
+            self._refreshing = True
+            self._attempted_at = now
+        threading.Thread(target=self._refresh_in_background, name="symbol-catalog-refresh", daemon=True).start()
+
+    def _refresh_in_background(self):
+        """后台刷新"""
+        try:
+            self.refresh()
+        except Exception as e:
+            logger.warning("刷新交易品种目录失败: %s", e)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self, name: str) -> Optional[SymbolInfo]:
+        """获取交易品种元数据"""
+        self.refresh_async()
+        with self._lock:
+            info = self._symbols.get(name)
+        CACHE_REQUESTS.inc(cache="symbol", result="miss" if info is None else "hit")
+        return info
+
+    def validate(self, name: str):
+        """校验交易品种是否存在
+
+        目录尚未加载时跳过，由终端获取到空结果时经symbol_info逐个校验；
+        未找到时触发一次后台刷新，使终端新增的品种尽快可用。
+        """
+        if not self.loaded:
+            self.refresh_async()
+            return
+        if self.get(name) is None:
+            self.refresh_async(force=True)
+            raise InvalidSymbolError(f"无效的交易品种: {name}")
+
+    def search(self, group: Optional[str] = None) -> List[str]:
+        """按MT5分组语法查询交易品种名称，如 *USD*、EUR*,!*JPY"""
+        self.refresh_async()
+        with self._lock:
+            names = self._names
+        if not group or group.strip() == "*":
+            return list(names)
+
+        includes, excludes = [], []
+        for pattern in group.split(","):
+            pattern = pattern.strip()
+            if pattern.startswith("!"):
+                excludes.append(pattern[1:])
+            elif pattern:
+                includes.append(pattern)
+
+        if not includes:
+            # 只有排除条件时从全部品种中排除
+            includes.append("*")
+
+        matched = set()
+        for pattern in includes:
+            if _is_prefix_pattern(pattern):
+                prefix = pattern[:-1]
+                start = bisect.bisect_left(names, prefix)
+                end = bisect.bisect_left(names, prefix + "\uffff")
+                matched.update(names[start:end])
+            else:
+                matched.update(name for name in names if fnmatchcase(name, pattern))
+        if excludes:
+            matched = {name for name in matched if not any(fnmatchcase(name, p) for p in excludes)}
+        return sorted(matched)
@@ -0,0 +1,245 @@
+"""MT5终端工作进程池
+
+MetaTrader5绑定每个进程只能连接一个终端，单终端即为获取吞吐量的上限。
+进程池模式下，每个子进程连接一个独立安装路径的终端，各自带一个获取队列；
+请求按交易品种亲和分配（同一品种固定落在同一终端，便于终端侧缓存），
+K线经共享内存返回。后台定期健康检查，失败或无响应的子进程自动重启。
+"""
+import logging
+import multiprocessing
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+import numpy as np
+from app.config import settings
+from app.exceptions import MT5ConnectionError
+from app.metrics import observe_stage, MT5_WORKER_RESTARTS
+from app.services.bar_owner import encode_error, decode_error
+from app.services.fetch_queue import FetchQueue, PRIORITY_LIVE
+
+logger = logging.getLogger(__name__)
+
+# Windows不支持fork，统一使用spawn，避免在多线程进程中fork
+_mp_context = multiprocessing.get_context("spawn")
+
+def _worker_main(conn, path: str):
+    """终端子进程主循环"""
+    from app.services import mt5_terminal
+
+    try:
+        mt5_terminal.connect_terminal(path)
+    except MT5ConnectionError:
+        # 连接失败时继续运行，后续请求与健康检查会重试连接
+        pass
+
+    while True:
+        try:
+            op, args = conn.recv()
+        except (EOFError, OSError):
+            return
+
+        try:
+            if op == "ping":
+                if not mt5_terminal.terminal_connected():
+                    mt5_terminal.connect_terminal(path)
+                conn.send(("ok", True))
+            elif op == "symbols":
+                if not mt5_terminal.terminal_connected():
+                    mt5_terminal.connect_terminal(path)
+                conn.send(("ok", mt5_terminal.get_symbol_infos()))
+            elif op == "fetch":
+                if not mt5_terminal.terminal_connected():
+                    mt5_terminal.connect_terminal(path)
+                _send_rates(conn, mt5_terminal.copy_rates(*args))
+            elif op == "ticks":
+                if not mt5_terminal.terminal_connected():
+                    mt5_terminal.connect_terminal(path)
+                _send_rates(conn, mt5_terminal.copy_ticks(*args))
+            else:
+                conn.send(("error", "DataRetrievalError", 500, f"不支持的操作: {op}", None))
+        except Exception as e:
+            conn.send(encode_error(e))
+
+def _send_rates(conn, rates: np.ndarray):
+    """经共享内存返回K线：写入共享内存块，待父进程复制完成后释放"""
+    shm = shared_memory.SharedMemory(create=True, size=max(1, rates.nbytes))
+    try:
+        np.ndarray(rates.shape, dtype=rates.dtype, buffer=shm.buf)[:] = rates
+        conn.send(("ok", (shm.name, rates.dtype, rates.shape)))
+        # 等待父进程确认已复制（Windows下最后一个句柄关闭时共享内存即被释放）
+        conn.recv()
+    finally:
+        shm.close()
+        shm.unlink()
+
+def _read_rates(name: str, dtype: np.dtype, shape: tuple) -> np.ndarray:
+    """从共享内存复制K线"""
+    # 共享内存由子进程负责释放，这里只复制后关闭
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        rates = view.copy()
+        del view
+        return rates
+    finally:
+        shm.close()
+
+class TerminalWorker:
+    """单个终端子进程及其获取队列"""
+
+    def __init__(self, index: int, path: str, max_depth: int):
+        self.index = index
+        self.path = path
+        self.healthy = False
+        self.process = None
+        self.conn = None
+        # 同一子进程上的调用由该队列的工作线程串行执行
+        self.queue = FetchQueue(max_depth, name=f"mt5-terminal-{index}")
+        self._start()
+
+    def _start(self):
+        """启动子进程"""
+        parent_conn, child_conn = _mp_context.Pipe()
+        process = _mp_context.Process(
+            target=_worker_main, args=(child_conn, self.path), name=f"mt5-terminal-{self.index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self.process, self.conn = process, parent_conn
+        self.healthy = True
+
+    def restart(self):
+        """终止并重新启动子进程"""
+        logger.warning("重启MT5终端工作进程 %s (%s)", self.index, self.path)
+        MT5_WORKER_RESTARTS.inc(worker=str(self.index))
+        self.healthy = False
+        try:
+            self.conn.close()
+            self.process.terminate()
+            self.process.join(5)
+        except Exception:
+            pass
+        self._start()
+
+    def call(self, op: str, *args):
+        """向子进程发送请求并等待结果（在获取队列线程中执行）"""
+        if not self.process.is_alive():
+            self.restart()
+
+        try:
+            self.conn.send((op, args))
+            if not self.conn.poll(settings.mt5_pool_call_timeout):
+                self.restart()
+                raise MT5ConnectionError(f"MT5终端工作进程{self.index}响应超时")
+            reply = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.restart()
+            raise MT5ConnectionError(f"MT5终端工作进程{self.index}异常退出: {str(e)}")
+
+        if reply[0] == "error":
+            exc = decode_error(*reply[1:])
+            self.healthy = not isinstance(exc, MT5ConnectionError)
+            raise exc
+        self.healthy = True
+        if op in ("fetch", "ticks"):
+            try:
+                return _read_rates(*reply[1])
+            finally:
+                self.conn.send("ack")
+        return reply[1]
+
+    def fetch(self, symbol: str, timeframe: str, mt5_start_time, mt5_end_time) -> np.ndarray:
+        """获取K线"""
+        with observe_stage("mt5_fetch", timeframe=timeframe):
+            return self.call("fetch", symbol, timeframe, mt5_start_time, mt5_end_time)
+
+    def fetch_ticks(self, symbol: str, mt5_start_time, mt5_end_time, flags: str) -> np.ndarray:
+        """获取逐笔报价"""
+        return self.call("ticks", symbol, mt5_start_time, mt5_end_time, flags)
+
+class TerminalPool:
+    """MT5终端工作进程池"""
+
+    def __init__(self, paths: List[str], max_depth: int):
+        self.workers = [TerminalWorker(index, path, max_depth) for index, path in enumerate(paths)]
+        self._monitor = threading.Thread(target=self._health_loop, name="mt5-terminal-health", daemon=True)
+        self._monitor.start()
+
+    def _select(self, symbol: str) -> TerminalWorker:
+        """按交易品种亲和选择子进程，不健康时顺延到下一个健康的子进程"""
+        start = zlib.crc32(symbol.encode()) % len(self.workers)
+        for offset in range(len(self.workers)):
+            worker = self.workers[(start + offset) % len(self.workers)]
+            if worker.healthy:
+                return worker
+        return self.workers[start]
+
+    def submit(
+        self,
+        symbol: str,
+        timeframe: str,
+        mt5_start_time,
+        mt5_end_time,
+        priority: int,
+        deadline: Optional[float] = None,
+        context=None
+    ) -> Future:
+        """提交K线获取请求，返回concurrent.futures.Future"""
+        worker = self._select(symbol)
+        args = (worker.fetch, symbol, timeframe, mt5_start_time, mt5_end_time)
+        if context is not None:
+            args = (context.run,) + args
+        return worker.queue.submit(*args, priority=priority, deadline=deadline)
+
+    def submit_ticks(
+        self,
+        symbol: str,
+        mt5_start_time,
+        mt5_end_time,
+        flags: str,
+        priority: int,
+        deadline: Optional[float] = None
+    ) -> Future:
+        """提交逐笔报价获取请求，返回concurrent.futures.Future"""
+        worker = self._select(symbol)
+        return worker.queue.submit(
+            worker.fetch_ticks, symbol, mt5_start_time, mt5_end_time, flags, priority=priority, deadline=deadline
+        )
+
+    def get_symbol_infos(self) -> List[Dict]:
+        """获取交易品种元数据"""
+        worker = self._select("")
+        return worker.queue.submit(worker.call, "symbols", priority=PRIORITY_LIVE).result()
+
+    def is_connected(self) -> bool:
+        """是否至少有一个终端可用"""
+        return any(worker.healthy for worker in self.workers)
+
+    def _health_loop(self):
+        """定期健康检查，检查请求与获取请求排在同一队列中，由call负责重启失败的子进程"""
+        while True:
+            time.sleep(settings.mt5_pool_health_interval)
+            futures = []
+            for worker in self.workers:
+                try:
+                    futures.append(worker.queue.submit(worker.call, "ping", priority=PRIORITY_LIVE))
+                except Exception:
+                    # 队列已满时跳过本轮检查
+                    continue
+            for future in futures:
+                try:
+                    future.result(settings.mt5_pool_call_timeout * 2)
+                except Exception:
+                    continue
+
+    def close(self):
+        """终止全部子进程"""
+        for worker in self.workers:
+            try:
+                worker.conn.close()
+                worker.process.terminate()
+            except Exception:
+                pass
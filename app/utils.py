@@ -1,5 +1,24 @@
+import numpy as np
 from datetime import datetime, timezone, timedelta
-from typing import Union
+from typing import List, Union
+
+# MT5时间戳加5小时即为北京时间（与to_mt5_time的换算一致）
+MT5_BEIJING_OFFSET = 5 * 3600
+# 北京时间相对UTC的偏移
+BEIJING_UTC_OFFSET = 8 * 3600
+
+# 各时间周期对应的秒数（MN1按31天计，仅用于判断K线是否收盘）
+TIMEFRAME_SECONDS = {
+    "M1": 60,
+    "M5": 300,
+    "M15": 900,
+    "M30": 1800,
+    "H1": 3600,
+    "H4": 14400,
+    "D1": 86400,
+    "W1": 604800,
+    "MN1": 2678400
+}
 
 def to_beijing_time(dt: Union[datetime, str]) -> datetime:
     """将时间转换为北京时间"""
@@ -44,6 +63,22 @@ def format_mt5_time_to_beijing(dt: datetime) -> str:
     beijing_time = dt + timedelta(hours=5)
     return beijing_time.strftime('%Y-%m-%dT%H:%M:%S')
 
+def format_mt5_epochs_to_beijing(epochs: np.ndarray) -> List[str]:
+    """将MT5时间戳数组批量转换为北京时间字符串（同format_mt5_time_to_beijing）"""
+    shifted = np.asarray(epochs, dtype=np.int64) + MT5_BEIJING_OFFSET
+    return np.datetime_as_string(shifted.astype('datetime64[s]'), unit='s').tolist()
+
+def mt5_epochs_to_timestamps(epochs: np.ndarray) -> np.ndarray:
+    """将MT5时间戳数组批量转换为对应北京时间的Unix时间戳（即北京时间字符串按UTC+8解析的结果）"""
+    return np.asarray(epochs, dtype=np.int64) + (MT5_BEIJING_OFFSET - BEIJING_UTC_OFFSET)
+
 def get_beijing_now() -> datetime:
     """获取当前北京时间"""
     return datetime.now(timezone(timedelta(hours=8)))
+
+def is_closed_range(end_time: datetime, timeframe: str) -> bool:
+    """判断以end_time结束的区间内K线是否已全部收盘（无时区信息时按北京时间处理）"""
+    if end_time.tzinfo is None:
+        end_time = end_time.replace(tzinfo=timezone(timedelta(hours=8)))
+    period = TIMEFRAME_SECONDS.get(timeframe, 0)
+    return end_time + timedelta(seconds=period) <= get_beijing_now()